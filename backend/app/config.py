@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
@@ -14,6 +15,87 @@ class Settings:
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
     
+    # Price providers: coingecko, coingecko_pro or file. With a secondary set, requests are
+    # hedged: the secondary is fired if the primary hasn't answered after PRICE_HEDGE_AFTER_SECONDS
+    PRICE_PROVIDER: str = os.getenv("PRICE_PROVIDER", "coingecko")
+    PRICE_PROVIDER_SECONDARY: str = os.getenv("PRICE_PROVIDER_SECONDARY", "")
+    PRICE_HEDGE_AFTER_SECONDS: float = float(os.getenv("PRICE_HEDGE_AFTER_SECONDS", 3.0))
+    PRICE_FILE_SOURCE: str = os.getenv("PRICE_FILE_SOURCE", "")
+    COINGECKO_API_KEY: str = os.getenv("COINGECKO_API_KEY", "")
+    COINGECKO_PRO_API_KEY: str = os.getenv("COINGECKO_PRO_API_KEY", "")
+    COINGECKO_PRO_RATE_LIMIT_PER_MINUTE: int = int(os.getenv("COINGECKO_PRO_RATE_LIMIT_PER_MINUTE", 500))
+    
+    # CoinGecko fetching: IDs per request, parallel requests and the plan's rate limit
+    COINGECKO_CHUNK_SIZE: int = int(os.getenv("COINGECKO_CHUNK_SIZE", 250))
+    COINGECKO_MAX_CONCURRENCY: int = int(os.getenv("COINGECKO_MAX_CONCURRENCY", 4))
+    COINGECKO_RATE_LIMIT_PER_MINUTE: int = int(os.getenv("COINGECKO_RATE_LIMIT_PER_MINUTE", 30))
+    COINGECKO_MAX_RETRIES: int = int(os.getenv("COINGECKO_MAX_RETRIES", 3))
+    
+    # Write-skip: a tick that moved less than the coin's threshold (percent; coins without
+    # their own price_change_threshold use the default) doesn't update the coin's current
+    # price row; it still goes into the price history and candles. A coin's current price
+    # is rewritten at least every PRICE_MAX_SKIP_MINUTES so the 24h change doesn't go stale.
+    PRICE_CHANGE_THRESHOLD_PCT: float = float(os.getenv("PRICE_CHANGE_THRESHOLD_PCT", 0.0))
+    PRICE_MAX_SKIP_MINUTES: int = int(os.getenv("PRICE_MAX_SKIP_MINUTES", 60))
+    
+    # Leader election: only the leader runs the price scheduler. Followers retry (and the
+    # leader heartbeats) every LEADER_CHECK_INTERVAL_SECONDS, which bounds failover time
+    LEADER_CHECK_INTERVAL_SECONDS: float = float(os.getenv("LEADER_CHECK_INTERVAL_SECONDS", 5.0))
+    LEADER_LOCK_DIR: str = os.getenv("LEADER_LOCK_DIR", tempfile.gettempdir())
+    # Followers don't fetch prices; they reload the leader's prices from the database this often
+    PRICE_SNAPSHOT_SYNC_SECONDS: int = int(os.getenv("PRICE_SNAPSHOT_SYNC_SECONDS", 60))
+    
+    # Price history retention (raw ticks and 5m candles; 1h and 1d candles are kept forever)
+    PRICE_TICK_RETENTION_DAYS: int = int(os.getenv("PRICE_TICK_RETENTION_DAYS", 7))
+    PRICE_CANDLE_5M_RETENTION_DAYS: int = int(os.getenv("PRICE_CANDLE_5M_RETENTION_DAYS", 90))
+    
+    # Expo push client: at most EXPO_MAX_IN_FLIGHT concurrent requests over a keep-alive pool,
+    # throttled to EXPO_MESSAGES_PER_SECOND messages (Expo's documented limit is 600/s per project)
+    EXPO_MAX_IN_FLIGHT: int = int(os.getenv("EXPO_MAX_IN_FLIGHT", 6))
+    EXPO_MESSAGES_PER_SECOND: float = float(os.getenv("EXPO_MESSAGES_PER_SECOND", 600))
+    EXPO_MAX_RETRIES: int = int(os.getenv("EXPO_MAX_RETRIES", 3))
+    
+    # Push receipts: tickets are checked once they are this old (Expo recommends waiting ~15 min),
+    # PAGE_SIZE tickets per transaction; the dispatcher polls every INTERVAL_MINUTES
+    PUSH_RECEIPT_DELAY_MINUTES: int = int(os.getenv("PUSH_RECEIPT_DELAY_MINUTES", 15))
+    PUSH_RECEIPT_PAGE_SIZE: int = int(os.getenv("PUSH_RECEIPT_PAGE_SIZE", 5000))
+    PUSH_RECEIPT_INTERVAL_MINUTES: int = int(os.getenv("PUSH_RECEIPT_INTERVAL_MINUTES", 15))
+    
+    # Notification scheduler: each worker claims overdue rows (FOR UPDATE SKIP LOCKED) in batches
+    # of this size, one transaction per batch. A claim is sent as 100-message Expo requests in
+    # flight together, so the default (100 x EXPO_MAX_IN_FLIGHT) keeps every slot busy.
+    # Diagnostic mode additionally dumps every active notification's schedule (very verbose).
+    NOTIFICATION_CLAIM_BATCH_SIZE: int = int(os.getenv("NOTIFICATION_CLAIM_BATCH_SIZE", 100 * EXPO_MAX_IN_FLIGHT))
+    NOTIFICATION_DIAGNOSTICS: bool = os.getenv("NOTIFICATION_DIAGNOSTICS", "false").lower() in ("1", "true", "yes")
+    
+    # Digest mode: a user's due notifications, plus those due within the next DIGEST_WINDOW_SECONDS,
+    # are sent as one push listing up to DIGEST_MAX_COINS coins (each still gets its own log row)
+    NOTIFICATION_DIGEST_ENABLED: bool = os.getenv("NOTIFICATION_DIGEST_ENABLED", "false").lower() in ("1", "true", "yes")
+    NOTIFICATION_DIGEST_WINDOW_SECONDS: int = int(os.getenv("NOTIFICATION_DIGEST_WINDOW_SECONDS", 120))
+    NOTIFICATION_DIGEST_MAX_COINS: int = int(os.getenv("NOTIFICATION_DIGEST_MAX_COINS", 10))
+    
+    # Notification dispatcher: loads upcoming send times this far ahead (at most LIMIT distinct
+    # times), is woken early via LISTEN/NOTIFY and retries failed sends after RETRY_SECONDS
+    NOTIFICATION_REFILL_WINDOW_MINUTES: int = int(os.getenv("NOTIFICATION_REFILL_WINDOW_MINUTES", 15))
+    NOTIFICATION_REFILL_LIMIT: int = int(os.getenv("NOTIFICATION_REFILL_LIMIT", 10000))
+    NOTIFICATION_RETRY_SECONDS: int = int(os.getenv("NOTIFICATION_RETRY_SECONDS", 60))
+    NOTIFICATION_MAX_SLEEP_SECONDS: float = float(os.getenv("NOTIFICATION_MAX_SLEEP_SECONDS", 300))
+    
+    # Delivery outbox: senders claim pending rows in batches (SKIP LOCKED) and retry failed sends
+    # with exponential backoff (BASE doubling up to MAX seconds) at most MAX_ATTEMPTS times.
+    # Continuous senders poll every POLL_SECONDS; sent/failed rows are kept RETENTION_DAYS.
+    OUTBOX_CLAIM_BATCH_SIZE: int = int(os.getenv("OUTBOX_CLAIM_BATCH_SIZE", 100 * EXPO_MAX_IN_FLIGHT))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 6))
+    OUTBOX_RETRY_BASE_SECONDS: float = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", 30))
+    OUTBOX_RETRY_MAX_SECONDS: float = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", 1800))
+    OUTBOX_POLL_SECONDS: float = float(os.getenv("OUTBOX_POLL_SECONDS", 5))
+    OUTBOX_RETENTION_DAYS: int = int(os.getenv("OUTBOX_RETENTION_DAYS", 7))
+    
+    # Notification logs are buffered and bulk-inserted once this many rows are queued
+    # or the oldest queued row is this old (and always at the end of a run / at exit)
+    LOG_WRITER_MAX_ROWS: int = int(os.getenv("LOG_WRITER_MAX_ROWS", 1000))
+    LOG_WRITER_MAX_AGE_SECONDS: float = float(os.getenv("LOG_WRITER_MAX_AGE_SECONDS", 5.0))
+    
     # Environment
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
     
@@ -1,16 +1,27 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, and_
-from typing import Optional, List
+from sqlalchemy import desc, and_, or_, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Optional, List, Iterator
+from datetime import datetime, timezone
 import uuid
 from decimal import Decimal
 
-from app.models.models import User, Coin, CoinPrice, Favorite, Log, Notification
+from app.models.models import User, Coin, CoinPrice, PriceHistory, PriceCandle, Favorite, Log, Notification
 from app.schemas.schemas import (
     UserCreate, UserUpdate, CoinCreate, CoinUpdate, 
     CoinPriceCreate, CoinPriceUpdate, FavoriteCreate, 
     LogCreate, LogUpdate, NotificationCreate
 )
 
+def dialect_insert(db: Session):
+    """Return the dialect-specific insert() that supports ON CONFLICT clauses"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Upsert not supported for dialect: {dialect}")
+
 # User CRUD operations
 class UserCRUD:
     @staticmethod
@@ -129,6 +140,44 @@ class CoinPriceCRUD:
         db.refresh(db_price)
         return db_price
     
+    # Keeps each statement well under the bind parameter limits (65535 on Postgres)
+    BULK_UPSERT_CHUNK_SIZE = 5000
+
+    @staticmethod
+    def bulk_upsert_coin_prices(db: Session, rows: List[dict]) -> int:
+        """
+        Apply a whole batch of price rows (coin_id, price, change, is_positive)
+        as a single INSERT ... ON CONFLICT (coin_id) DO UPDATE.
+        Rows whose values did not change are left untouched.
+        Returns the number of rows that were inserted or really changed.
+        """
+        if not rows:
+            return 0
+        
+        insert = dialect_insert(db)
+        changed = 0
+        chunk_size = CoinPriceCRUD.BULK_UPSERT_CHUNK_SIZE
+        for start in range(0, len(rows), chunk_size):
+            stmt = insert(CoinPrice).values(rows[start:start + chunk_size])
+            excluded = stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[CoinPrice.coin_id],
+                set_={
+                    "price": excluded.price,
+                    "change": excluded.change,
+                    "is_positive": excluded.is_positive,
+                    "updated_at": func.now(),
+                },
+                where=or_(
+                    CoinPrice.price.is_distinct_from(excluded.price),
+                    CoinPrice.change.is_distinct_from(excluded.change),
+                    CoinPrice.is_positive.is_distinct_from(excluded.is_positive),
+                )
+            )
+            changed += db.execute(stmt).rowcount
+        
+        return changed
+    
     @staticmethod
     def delete_coin_price(db: Session, coin_id: int) -> bool:
         db_price = db.query(CoinPrice).filter(CoinPrice.coin_id == coin_id).first()
@@ -138,6 +187,131 @@ class CoinPriceCRUD:
             return True
         return False
 
+# PriceHistory CRUD operations
+class PriceHistoryCRUD:
+    @staticmethod
+    def append_prices(db: Session, rows: List[dict], ts: datetime) -> int:
+        """Append one tick per price row, all stamped with ts, in a single multi-row insert"""
+        if not rows:
+            return 0
+        
+        history_rows = [
+            {"coin_id": row["coin_id"], "ts": ts, "price": row["price"], "change": row["change"]}
+            for row in rows
+        ]
+        insert = dialect_insert(db)
+        chunk_size = CoinPriceCRUD.BULK_UPSERT_CHUNK_SIZE
+        for start in range(0, len(history_rows), chunk_size):
+            stmt = insert(PriceHistory).values(history_rows[start:start + chunk_size])
+            db.execute(stmt.on_conflict_do_nothing(index_elements=[PriceHistory.coin_id, PriceHistory.ts]))
+        return len(history_rows)
+    
+    @staticmethod
+    def iter_prices(
+        db: Session, coin_id: int, start: datetime, end: datetime, batch_size: int = 1000
+    ) -> Iterator[tuple]:
+        """Yield (ts, price, change) for a coin and time window, streamed with a server-side cursor"""
+        result = db.execute(
+            select(PriceHistory.ts, PriceHistory.price, PriceHistory.change)
+            .where(
+                PriceHistory.coin_id == coin_id,
+                PriceHistory.ts >= start,
+                PriceHistory.ts < end
+            )
+            .order_by(PriceHistory.ts)
+            .execution_options(yield_per=batch_size)
+        )
+        for row in result:
+            yield row
+    
+    @staticmethod
+    def delete_older_than(db: Session, cutoff: datetime) -> int:
+        """Drop raw ticks older than cutoff (retention)"""
+        return db.query(PriceHistory).filter(PriceHistory.ts < cutoff).delete(synchronize_session=False)
+
+# PriceCandle CRUD operations
+class PriceCandleCRUD:
+    # Bucket width in seconds per supported resolution
+    RESOLUTIONS = {"5m": 300, "1h": 3600, "1d": 86400}
+    
+    @staticmethod
+    def bucket_start(ts: datetime, resolution: str) -> datetime:
+        """Floor a timestamp to the start of its candle bucket (UTC)"""
+        width = PriceCandleCRUD.RESOLUTIONS[resolution]
+        epoch = int(ts.timestamp())
+        return datetime.fromtimestamp(epoch - epoch % width, tz=timezone.utc)
+    
+    @staticmethod
+    def apply_ticks(db: Session, rows: List[dict], ts: datetime) -> int:
+        """
+        Fold one batch of ticks into every candle resolution with a single upsert:
+        new buckets open at the tick price, existing ones extend high/low and move close.
+        """
+        if not rows:
+            return 0
+        
+        candle_rows = []
+        for resolution in PriceCandleCRUD.RESOLUTIONS:
+            bucket = PriceCandleCRUD.bucket_start(ts, resolution)
+            for row in rows:
+                candle_rows.append({
+                    "coin_id": row["coin_id"],
+                    "resolution": resolution,
+                    "bucket_start": bucket,
+                    "open": row["price"],
+                    "high": row["price"],
+                    "low": row["price"],
+                    "close": row["price"],
+                    "samples": 1
+                })
+        
+        # GREATEST/LEAST on Postgres, multi-argument MAX/MIN on SQLite
+        is_postgres = db.get_bind().dialect.name == "postgresql"
+        greatest = func.greatest if is_postgres else func.max
+        least = func.least if is_postgres else func.min
+        
+        insert = dialect_insert(db)
+        chunk_size = CoinPriceCRUD.BULK_UPSERT_CHUNK_SIZE
+        for start in range(0, len(candle_rows), chunk_size):
+            stmt = insert(PriceCandle).values(candle_rows[start:start + chunk_size])
+            excluded = stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[PriceCandle.coin_id, PriceCandle.resolution, PriceCandle.bucket_start],
+                set_={
+                    "high": greatest(PriceCandle.high, excluded.high),
+                    "low": least(PriceCandle.low, excluded.low),
+                    "close": excluded.close,
+                    "samples": PriceCandle.samples + 1,
+                }
+            )
+            db.execute(stmt)
+        
+        return len(candle_rows)
+    
+    @staticmethod
+    def get_candles(
+        db: Session, coin_id: int, resolution: str, start: datetime, end: datetime
+    ) -> List[PriceCandle]:
+        return (
+            db.query(PriceCandle)
+            .filter(
+                PriceCandle.coin_id == coin_id,
+                PriceCandle.resolution == resolution,
+                PriceCandle.bucket_start >= start,
+                PriceCandle.bucket_start < end
+            )
+            .order_by(PriceCandle.bucket_start)
+            .all()
+        )
+    
+    @staticmethod
+    def delete_older_than(db: Session, resolution: str, cutoff: datetime) -> int:
+        """Drop candles of one resolution older than cutoff (retention)"""
+        return db.query(PriceCandle).filter(
+            PriceCandle.resolution == resolution,
+            PriceCandle.bucket_start < cutoff
+        ).delete(synchronize_session=False)
+
 # Favorite CRUD operations
 class FavoriteCRUD:
     @staticmethod
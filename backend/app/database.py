@@ -40,11 +40,11 @@ async def init_db():
                 SELECT table_name 
                 FROM information_schema.tables 
                 WHERE table_schema IN ('public', 'auth') 
-                AND table_name IN ('users', 'coins', 'coin_prices', 'favorites', 'logs', 'notifications')
+                AND table_name IN ('users', 'coins', 'coin_prices', 'price_history', 'price_candles', 'favorites', 'logs', 'notifications')
             """))
             
             existing_tables = [row[0] for row in result]
-            expected_tables = ['users', 'coins', 'coin_prices', 'favorites', 'logs', 'notifications']
+            expected_tables = ['users', 'coins', 'coin_prices', 'price_history', 'price_candles', 'favorites', 'logs', 'notifications']
             missing_tables = set(expected_tables) - set(existing_tables)
             
             if missing_tables:
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Text, Numeric, Boolean, DateTime, UUID, ForeignKey, Index, CheckConstraint, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Numeric, Boolean, DateTime, UUID, ForeignKey, Index, CheckConstraint, UniqueConstraint, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, column_property
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from datetime import datetime
 import uuid
 
@@ -55,12 +55,19 @@ class User(Base):
 
 class Coin(Base):
     __tablename__ = "coins"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        Index("ix_coins_updated_at", "updated_at"),
+        {"schema": "public"},
+    )
     
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     name = Column(Text, nullable=False)
     symbol = Column(Text, nullable=False, unique=True)
     color = Column(Text, nullable=False)
+    coingecko_id = Column(Text, nullable=True, unique=True)
+    # Minimum move in percent before a new price is written (NULL = global default)
+    price_change_threshold = Column(Numeric, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
     
     # Relationships - using string references to avoid circular imports
     price = relationship("CoinPrice", back_populates="coin", uselist=False, cascade="all, delete-orphan")
@@ -81,6 +88,37 @@ class CoinPrice(Base):
     # Relationships - using string references to avoid circular imports
     coin = relationship("Coin", back_populates="price")
 
+class PriceHistory(Base):
+    """Append-only price ticks written in batches by the price ingestion job"""
+    __tablename__ = "price_history"
+    # The composite primary key doubles as the (coin_id, ts) index used by range queries
+    __table_args__ = (
+        Index("ix_price_history_ts", "ts"),
+        {"schema": "public"},
+    )
+    
+    coin_id = Column(BigInteger, ForeignKey("public.coins.id", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
+    ts = Column(DateTime(timezone=True), primary_key=True)
+    price = Column(Numeric, nullable=False)
+    change = Column(Numeric, nullable=True)
+
+class PriceCandle(Base):
+    """OHLC candles (5m, 1h, 1d) maintained incrementally from price ticks"""
+    __tablename__ = "price_candles"
+    __table_args__ = (
+        Index("ix_price_candles_resolution_bucket", "resolution", "bucket_start"),
+        {"schema": "public"},
+    )
+    
+    coin_id = Column(BigInteger, ForeignKey("public.coins.id", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
+    resolution = Column(String(3), primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    open = Column(Numeric, nullable=False)
+    high = Column(Numeric, nullable=False)
+    low = Column(Numeric, nullable=False)
+    close = Column(Numeric, nullable=False)
+    samples = Column(Integer, nullable=False, default=1)
+
 class Favorite(Base):
     __tablename__ = "favorites"
     __table_args__ = {"schema": "public"}
@@ -111,7 +149,19 @@ class Log(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # Partial index behind the scheduler's keyset-paginated overdue scan
+        Index(
+            "ix_notifications_due", "next_scheduled_at", "id",
+            postgresql_where=text("is_active"), sqlite_where=text("is_active")
+        ),
+        # A user's upcoming notifications, claimed together in digest mode
+        Index(
+            "ix_notifications_user_due", "user_id", "next_scheduled_at",
+            postgresql_where=text("is_active"), sqlite_where=text("is_active")
+        ),
+        {"schema": "public"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("auth.users.id", ondelete="CASCADE"), nullable=False)
@@ -151,4 +201,57 @@ class UserPushToken(Base):
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
 
     # Relationship back to User (falls dein User-Model das auch hat)
-    user = relationship("User", back_populates="push_token")
\ No newline at end of file
+    user = relationship("User", back_populates="push_token")
+class PushTicket(Base):
+    """Expo push ticket awaiting its receipt (rows are deleted once the receipt is checked)"""
+    __tablename__ = "push_tickets"
+    __table_args__ = (
+        Index("ix_push_tickets_created_at", "created_at"),
+        {"schema": "public"},
+    )
+
+    id = Column(Text, primary_key=True)
+    notification_id = Column(UUID(as_uuid=True), nullable=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    push_token = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+class NotificationOutbox(Base):
+    """
+    Rendered pushes waiting to be sent. The scheduler enqueues one row per due
+    notification and slot (idempotency key) in the same transaction that advances
+    the schedule; sender workers drain pending rows with retries and backoff.
+    """
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        UniqueConstraint("notification_id", "scheduled_for", name="uq_notification_outbox_slot"),
+        # Sender claim scan: pending rows in retry order
+        Index(
+            "ix_notification_outbox_pending", "next_attempt_at", "id",
+            postgresql_where=text("status = 'pending'"), sqlite_where=text("status = 'pending'")
+        ),
+        # Retention purge of sent/failed rows
+        Index(
+            "ix_notification_outbox_done", "created_at",
+            postgresql_where=text("status <> 'pending'"), sqlite_where=text("status <> 'pending'")
+        ),
+        {"schema": "public"},
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    notification_id = Column(UUID(as_uuid=True), nullable=False)
+    scheduled_for = Column(DateTime(timezone=True), nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    coin_id = Column(BigInteger, nullable=True)
+    push_token = Column(Text, nullable=False)
+    message = Column(JSON, nullable=False)
+
+    # pending -> sent, or failed once retries are exhausted / the error is permanent
+    status = Column(String(20), nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text, nullable=True)
+    ticket_id = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
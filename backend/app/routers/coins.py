@@ -1,16 +1,22 @@
 # routes/coins.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from app.database import get_db
 from app.models.models import Coin, CoinPrice
 from pydantic import BaseModel
 from typing import List, Optional
 from decimal import Decimal
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import asyncio
+import json
 import logging
 
 # Import your price service
-from app.services.price_service import CoinGeckoPriceService
+from app.services.price_service import update_all_coin_prices, trigger_price_refresh, is_refresh_in_flight
+from app.services.price_snapshot import PriceSnapshot, get_snapshot, load_snapshot, format_coin_response, as_utc
+from app.services.price_stream import price_hub
+from app.crud.crud import PriceHistoryCRUD, PriceCandleCRUD
 
 logger = logging.getLogger(__name__)
 
@@ -32,93 +38,109 @@ class CoinResponse(BaseModel):
     class Config:
         from_attributes = True
 
-async def should_update_prices(db: Session) -> bool:
-    """Check if prices need updating based on last update time"""
-    try:
-        # Get the most recent price update
-        latest_price = db.query(CoinPrice).order_by(CoinPrice.updated_at.desc()).first()
-        
-        if not latest_price or not latest_price.updated_at:
-            logger.info("No recent price data found, updating prices")
-            return True
-        
-        # Update if last update was more than 5 minutes ago
-        time_threshold = datetime.now() - timedelta(minutes=5)
-        needs_update = latest_price.updated_at < time_threshold
-        
-        if needs_update:
-            logger.info(f"Prices are stale (last update: {latest_price.updated_at}), updating")
-        else:
-            logger.info(f"Prices are fresh (last update: {latest_price.updated_at}), skipping update")
-            
-        return needs_update
-        
-    except Exception as e:
-        logger.error(f"Error checking price update status: {str(e)}")
+# Prices older than this trigger a background refresh
+PRICE_STALE_AFTER = timedelta(minutes=5)
+
+def should_update_prices(snapshot: PriceSnapshot) -> bool:
+    """Check if prices need updating based on the snapshot's last check time"""
+    if not snapshot.checked_at:
+        logger.info("No recent price data found, updating prices")
         return True
+    
+    time_threshold = datetime.now(timezone.utc) - PRICE_STALE_AFTER
+    needs_update = snapshot.checked_at < time_threshold
+    
+    if needs_update:
+        logger.info(f"Prices are stale (last update: {snapshot.checked_at}), refreshing in background")
+        
+    return needs_update
 
-async def update_prices_if_needed(db: Session):
-    """Update prices if they're stale"""
+def update_prices_if_needed(snapshot: PriceSnapshot):
+    """
+    Stale-while-revalidate: never blocks the request. If prices are stale a
+    background refresh is started, or joined when one is already running.
+    """
     try:
-        if await should_update_prices(db):
-            logger.info("Updating coin prices...")
-            await CoinGeckoPriceService.fetch_prices_for_all_coins(db)
-            logger.info("Coin prices updated successfully")
-        else:
-            logger.info("Prices are up to date, skipping update")
+        if not is_refresh_in_flight() and should_update_prices(snapshot):
+            trigger_price_refresh()
     except Exception as e:
-        logger.error(f"Error updating prices: {str(e)}")
+        logger.error(f"Error scheduling price update: {str(e)}")
         # Don't fail the request if price update fails, just log the error
 
-def format_coin_response(coin: Coin) -> dict:
-    """Format a coin object into the response format"""
-    coin_data = {
-        "id": coin.id,
-        "name": coin.name,
-        "symbol": coin.symbol,
-        "color": coin.color,
-        "price": None
-    }
-    
-    # Add price data if available
-    if coin.price:
-        coin_data["price"] = {
-            "current_price": float(coin.price.price) if coin.price.price else None,
-            "change_24h": float(coin.price.change) if coin.price.change else None,
-            "is_positive": coin.price.is_positive,
-            "updated_at": coin.price.updated_at.isoformat() if coin.price.updated_at else None
-        }
-    
-    return coin_data
-
 @router.get("/", response_model=List[CoinResponse])
 async def get_all_coins(db: Session = Depends(get_db)):
-    """Get all coins with their current prices (auto-updates prices if stale)"""
+    """Get all coins with their current prices (refreshes stale prices in the background)"""
     try:
-        # Update prices if needed
-        await update_prices_if_needed(db)
-        
-        # Query coins with their prices using a join
-        coins = db.query(Coin).options(joinedload(Coin.price)).all()
+        # Serve from the in-memory snapshot; only hit the database on cold start
+        snapshot = get_snapshot() or load_snapshot(db)
         
-        result = []
-        for coin in coins:
-            result.append(format_coin_response(coin))
+        # Refresh stale prices in the background
+        update_prices_if_needed(snapshot)
         
-        logger.info(f"Retrieved {len(result)} coins")
-        return result
+        logger.info(f"Retrieved {len(snapshot.coins)} coins")
+        return list(snapshot.coins)
         
     except Exception as e:
         logger.error(f"Error fetching coins: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching coins: {str(e)}")
 
+@router.websocket("/stream")
+async def stream_prices(websocket: WebSocket):
+    """
+    Push price updates to the client.
+    Sends a full snapshot on connect, then only the coins that changed after each price refresh.
+    """
+    await websocket.accept()
+    subscription = price_hub.subscribe()
+    
+    async def wait_for_disconnect():
+        # Clients don't send anything; this only notices when they go away
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+    
+    disconnect_task = asyncio.create_task(wait_for_disconnect())
+    try:
+        if get_snapshot() is None:
+            db = next(get_db())
+            try:
+                load_snapshot(db)
+            finally:
+                db.close()
+        
+        await websocket.send_text(price_hub.snapshot_message())
+        
+        while not disconnect_task.done():
+            get_task = asyncio.create_task(subscription.get())
+            done, _ = await asyncio.wait({get_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+            if get_task not in done:
+                get_task.cancel()
+                break
+            await websocket.send_text(get_task.result())
+            
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Price stream error: {str(e)}")
+        if not disconnect_task.done():
+            await websocket.close(code=1011)
+    finally:
+        disconnect_task.cancel()
+        price_hub.unsubscribe(subscription)
+
 @router.get("/{coin_id}", response_model=CoinResponse)
 async def get_coin(coin_id: int, db: Session = Depends(get_db)):
-    """Get a specific coin with its current price (auto-updates prices if stale)"""
+    """Get a specific coin with its current price (refreshes stale prices in the background)"""
     try:
-        # Update prices if needed
-        await update_prices_if_needed(db)
+        snapshot = get_snapshot() or load_snapshot(db)
+        update_prices_if_needed(snapshot)
+        
+        coin_data = snapshot.by_id.get(coin_id)
+        if coin_data:
+            return coin_data
         
+        # Coin may have been added after the snapshot was built
         coin = db.query(Coin).options(joinedload(Coin.price)).filter(Coin.id == coin_id).first()
         
         if not coin:
@@ -132,12 +154,119 @@ async def get_coin(coin_id: int, db: Session = Depends(get_db)):
         logger.error(f"Error fetching coin {coin_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching coin: {str(e)}")
 
+# Default window and maximum span for price history queries
+PRICE_HISTORY_DEFAULT_WINDOW = timedelta(days=1)
+PRICE_HISTORY_MAX_WINDOW = timedelta(days=366)
+PRICE_HISTORY_CHUNK_ROWS = 500
+
+def _stream_price_history(coin_id: int, start: datetime, end: datetime):
+    """Yield the JSON array of price points in chunks, reading rows through a server-side cursor"""
+    # Own session: the request-scoped one may be closed before the body is streamed
+    db = next(get_db())
+    try:
+        yield "["
+        buffer = []
+        first = True
+        for ts, price, change in PriceHistoryCRUD.iter_prices(db, coin_id, start, end):
+            buffer.append(json.dumps({
+                "ts": ts.isoformat(),
+                "price": float(price),
+                "change": float(change) if change is not None else None
+            }))
+            if len(buffer) >= PRICE_HISTORY_CHUNK_ROWS:
+                yield ("" if first else ",") + ",".join(buffer)
+                first = False
+                buffer = []
+        if buffer:
+            yield ("" if first else ",") + ",".join(buffer)
+        yield "]"
+    finally:
+        db.close()
+
+@router.get("/{coin_id}/prices")
+async def get_coin_price_history(
+    coin_id: int,
+    start: Optional[datetime] = Query(None, description="Window start (inclusive), defaults to end - 24h"),
+    end: Optional[datetime] = Query(None, description="Window end (exclusive), defaults to now"),
+    db: Session = Depends(get_db)
+):
+    """Stream the stored price ticks of a coin for a time window"""
+    end = as_utc(end) or datetime.now(timezone.utc)
+    start = as_utc(start) or end - PRICE_HISTORY_DEFAULT_WINDOW
+    
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > PRICE_HISTORY_MAX_WINDOW:
+        raise HTTPException(status_code=400, detail="Time window cannot exceed 366 days")
+    
+    snapshot = get_snapshot()
+    if (snapshot is None or coin_id not in snapshot.by_id) and not db.query(Coin.id).filter(Coin.id == coin_id).first():
+        raise HTTPException(status_code=404, detail="Coin not found")
+    
+    return StreamingResponse(
+        _stream_price_history(coin_id, start, end),
+        media_type="application/json"
+    )
+
+class CandleResponse(BaseModel):
+    bucket_start: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    samples: int
+
+# Default and maximum window per candle resolution
+CANDLE_WINDOWS = {
+    "5m": (timedelta(days=1), timedelta(days=90)),
+    "1h": (timedelta(days=30), timedelta(days=366)),
+    "1d": (timedelta(days=365), timedelta(days=3660)),
+}
+
+@router.get("/{coin_id}/candles", response_model=List[CandleResponse])
+async def get_coin_candles(
+    coin_id: int,
+    resolution: str = Query("1h", description="Candle resolution: 5m, 1h or 1d"),
+    start: Optional[datetime] = Query(None, description="Window start (inclusive)"),
+    end: Optional[datetime] = Query(None, description="Window end (exclusive), defaults to now"),
+    db: Session = Depends(get_db)
+):
+    """Get precomputed OHLC candles of a coin for a time window"""
+    if resolution not in CANDLE_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of: {', '.join(CANDLE_WINDOWS)}")
+    
+    default_window, max_window = CANDLE_WINDOWS[resolution]
+    end = as_utc(end) or datetime.now(timezone.utc)
+    start = as_utc(start) or end - default_window
+    
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > max_window:
+        raise HTTPException(status_code=400, detail=f"Time window too large for {resolution} candles")
+    
+    try:
+        candles = PriceCandleCRUD.get_candles(db, coin_id, resolution, start, end)
+        return [
+            {
+                "bucket_start": candle.bucket_start,
+                "open": float(candle.open),
+                "high": float(candle.high),
+                "low": float(candle.low),
+                "close": float(candle.close),
+                "samples": candle.samples
+            }
+            for candle in candles
+        ]
+    except Exception as e:
+        logger.error(f"Error fetching candles for coin {coin_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error fetching candles: {str(e)}")
+
 @router.post("/update-prices")
-async def manually_update_prices(db: Session = Depends(get_db)):
+async def manually_update_prices():
     """Manually trigger price updates (for testing/admin use)"""
     try:
         logger.info("Manual price update triggered")
-        await CoinGeckoPriceService.fetch_prices_for_all_coins(db)
+        await update_all_coin_prices()
         return {"message": "Prices updated successfully"}
     except Exception as e:
         logger.error(f"Manual price update failed: {str(e)}")
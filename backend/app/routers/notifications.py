@@ -8,6 +8,8 @@ import uuid
 
 from app.database import get_db
 from app.models.models import Notification, User, Coin
+from app.services.notification_events import notify_schedule_changed
+from app.utils.recurrence import convert_day_name_to_number, next_fire_time
 
 router = APIRouter(tags=["notifications"])
 
@@ -89,70 +91,6 @@ class NotificationResponse(BaseModel):
     class Config:
         from_attributes = True
 
-def convert_day_name_to_number(day_name: str) -> int:
-    """Convert day name to number (0=Monday, 6=Sunday)"""
-    days_map = {
-        'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
-        'friday': 4, 'saturday': 5, 'sunday': 6
-    }
-    return days_map.get(day_name.lower(), 0)
-
-def calculate_next_scheduled_time(
-    frequency_type: str,
-    interval_hours: Optional[int] = None,
-    preferred_time_str: Optional[str] = None,
-    preferred_day: Optional[str] = None
-) -> Optional[datetime]:
-    """Calculate the next scheduled notification time"""
-    now = datetime.utcnow()
-    
-    if frequency_type == 'hourly':
-        return now.replace(minute=0, second=0, microsecond=0)
-    
-    elif frequency_type == 'custom' and interval_hours:
-        from datetime import timedelta
-        return now + timedelta(hours=interval_hours)
-    
-    elif frequency_type == 'daily' and preferred_time_str:
-        # Parse preferred time
-        preferred_time_obj = datetime.strptime(preferred_time_str, '%H:%M').time()
-        next_time = datetime.combine(now.date(), preferred_time_obj)
-        
-        # If the time has already passed today, schedule for tomorrow
-        if next_time <= now:
-            from datetime import timedelta
-            next_time += timedelta(days=1)
-        
-        return next_time
-    
-    elif frequency_type == 'weekly' and preferred_time_str and preferred_day:
-        from datetime import timedelta
-        
-        # Parse preferred time
-        preferred_time_obj = datetime.strptime(preferred_time_str, '%H:%M').time()
-        preferred_day_num = convert_day_name_to_number(preferred_day)
-        
-        # Calculate days until preferred day
-        current_weekday = now.weekday()  # Monday is 0
-        days_ahead = preferred_day_num - current_weekday
-        
-        if days_ahead < 0:  # Target day has already happened this week
-            days_ahead += 7
-        elif days_ahead == 0:  # Target day is today
-            next_time = datetime.combine(now.date(), preferred_time_obj)
-            if next_time <= now:  # Time has already passed today
-                days_ahead = 7
-        
-        if days_ahead == 0:
-            next_time = datetime.combine(now.date(), preferred_time_obj)
-        else:
-            next_date = now.date() + timedelta(days=days_ahead)
-            next_time = datetime.combine(next_date, preferred_time_obj)
-        
-        return next_time
-    
-    return None
-
 @router.post("/", response_model=NotificationResponse, status_code=status.HTTP_201_CREATED)
 def create_notification(
     notification_data: NotificationCreate,
@@ -201,7 +139,7 @@ def create_notification(
         preferred_day_num = convert_day_name_to_number(notification_data.preferred_day)
     
     # Calculate next scheduled time
-    next_scheduled_at = calculate_next_scheduled_time(
+    next_scheduled_at = next_fire_time(
         notification_data.frequency_type,
         notification_data.interval_hours,
         notification_data.preferred_time,
@@ -222,6 +160,7 @@ def create_notification(
     
     try:
         db.add(db_notification)
+        notify_schedule_changed(db, next_scheduled_at)
         db.commit()
         db.refresh(db_notification)
         return db_notification
@@ -406,7 +345,7 @@ def update_notification_by_user_coin(
         preferred_day_num = convert_day_name_to_number(notification_data.preferred_day)
     
     # Calculate next scheduled time
-    next_scheduled_at = calculate_next_scheduled_time(
+    next_scheduled_at = next_fire_time(
         notification_data.frequency_type,
         notification_data.interval_hours,
         notification_data.preferred_time,
@@ -421,6 +360,7 @@ def update_notification_by_user_coin(
     notification.next_scheduled_at = next_scheduled_at
     
     try:
+        notify_schedule_changed(db, next_scheduled_at)
         db.commit()
         db.refresh(notification)
         return notification
@@ -452,23 +392,12 @@ def toggle_notification_status(
     
     # If activating the notification, recalculate next_scheduled_at
     if notification.is_active:
-        # Convert preferred_day back to string for calculation
-        preferred_day_str = None
-        if notification.preferred_day is not None:
-            day_names = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-            preferred_day_str = day_names[notification.preferred_day]
-        
-        # Convert preferred_time back to string for calculation
-        preferred_time_str = None
-        if notification.preferred_time:
-            preferred_time_str = notification.preferred_time.strftime('%H:%M')
-        
-        # Recalculate next scheduled time
-        next_scheduled_at = calculate_next_scheduled_time(
+        # Recalculate next scheduled time from the stored columns
+        next_scheduled_at = next_fire_time(
             notification.frequency_type,
             notification.interval_hours,
-            preferred_time_str,
-            preferred_day_str
+            notification.preferred_time,
+            notification.preferred_day
         )
         notification.next_scheduled_at = next_scheduled_at
     else:
@@ -476,6 +405,7 @@ def toggle_notification_status(
         notification.next_scheduled_at = None
     
     try:
+        notify_schedule_changed(db, notification.next_scheduled_at)
         db.commit()
         db.refresh(notification)
         return notification
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Notification Dispatcher - long-running, event-driven replacement for polling.
+Keeps a min-heap of upcoming next_scheduled_at values (refilled from the DB in
+windows), sleeps exactly until the earliest one and is woken early through
+Postgres LISTEN/NOTIFY when notifications are created, updated or toggled.
+"""
+
+import heapq
+import logging
+import select
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from app.config import settings
+from app.database import engine, get_db
+from app.models.models import Notification
+from app.scheduler.notification_scheduler import process_overdue_notifications
+from app.scheduler.outbox_sender import drain_outbox, purge_outbox
+from app.services.notification_events import SCHEDULE_CHANNEL
+from app.services.push_receipts import check_push_receipts
+from app.services.price_snapshot import as_utc
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduleListener:
+    """LISTEN connection on the schedule channel (plain sleeping when not on Postgres)"""
+
+    def __init__(self):
+        self._conn = None
+
+    def ensure_connected(self):
+        """(Re)open the LISTEN connection if needed; on failure we fall back to sleeping"""
+        if self._conn is not None or engine.dialect.name != "postgresql":
+            return
+        try:
+            conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            conn.exec_driver_sql(f"LISTEN {SCHEDULE_CHANNEL}")
+            self._conn = conn
+            logger.info(f"Listening on channel {SCHEDULE_CHANNEL}")
+        except Exception as e:
+            logger.error(f"Failed to listen on {SCHEDULE_CHANNEL}: {str(e)}")
+
+    def wait(self, timeout: float) -> List[str]:
+        """Block up to timeout seconds; returns the payloads of notifications received"""
+        if self._conn is None:
+            time.sleep(timeout)
+            return []
+
+        raw = self._conn.connection.driver_connection
+        readable, _, _ = select.select([raw], [], [], timeout)
+        if not readable:
+            return []
+
+        raw.poll()
+        payloads = [notify.payload for notify in raw.notifies]
+        raw.notifies.clear()
+        return payloads
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+
+class NotificationDispatcher:
+    """
+    Dispatch loop: run process_overdue_notifications() when the earliest upcoming
+    time is reached, hand the outbox it filled to a background drain thread (so a
+    long drain never delays the next due time), then refill the heap. Rows that
+    were due by the last run's cutoff but stay overdue (not enqueued, e.g. failed
+    to render) are retried after NOTIFICATION_RETRY_SECONDS instead of in a tight
+    loop; failed sends are retried by the outbox senders.
+    Push receipts are checked (and old outbox rows purged) every
+    PUSH_RECEIPT_INTERVAL_MINUTES in between.
+    """
+
+    def __init__(self):
+        self.window = timedelta(minutes=settings.NOTIFICATION_REFILL_WINDOW_MINUTES)
+        self.max_sleep = settings.NOTIFICATION_MAX_SLEEP_SECONDS
+        self.retry_delay = timedelta(seconds=settings.NOTIFICATION_RETRY_SECONDS)
+        self.listener = ScheduleListener()
+        self._heap: List[datetime] = []
+        self._window_end: Optional[datetime] = None
+        self._retry_at: Optional[datetime] = None
+        self._processed_until: Optional[datetime] = None
+        self._drain_requested = threading.Event()
+        self._drain_thread: Optional[threading.Thread] = None
+        self.receipt_interval = timedelta(minutes=settings.PUSH_RECEIPT_INTERVAL_MINUTES)
+        self._receipts_at = datetime.now(timezone.utc) + self.receipt_interval
+
+    def refill(self):
+        """Load the distinct upcoming times of the next window (index-only on ix_notifications_due)"""
+        now = datetime.now(timezone.utc)
+        window_end = now + self.window
+        limit = settings.NOTIFICATION_REFILL_LIMIT
+
+        db = next(get_db())
+        try:
+            rows = db.query(Notification.next_scheduled_at).filter(
+                Notification.is_active == True,
+                Notification.next_scheduled_at <= window_end
+            ).group_by(
+                Notification.next_scheduled_at
+            ).order_by(
+                Notification.next_scheduled_at
+            ).limit(limit).all()
+        finally:
+            db.close()
+
+        times = [as_utc(row.next_scheduled_at) for row in rows]
+        if len(times) == limit:
+            # More to come than we loaded: refill again once we get past the last one
+            window_end = times[-1]
+
+        # Times that came due after the last run's cutoff haven't been tried yet: due right away
+        processed_until = self._processed_until
+        heap = [t for t in times if processed_until is None or t > processed_until]
+        if len(heap) < len(times):
+            # Still overdue after a run means they couldn't be enqueued: retry later, not right away
+            heap.append(max(now, self._retry_at or now))
+        heapq.heapify(heap)
+
+        self._heap = heap
+        self._window_end = window_end
+        logger.info(f"Dispatcher refilled {len(heap)} upcoming times until {window_end}")
+
+    def push(self, payload: str):
+        """Add a time announced through NOTIFY, if it falls in the loaded window"""
+        if not payload:
+            return
+        try:
+            scheduled_at = as_utc(datetime.fromisoformat(payload))
+        except ValueError:
+            logger.warning(f"Ignoring invalid schedule payload: {payload}")
+            return
+        if self._window_end is not None and scheduled_at <= self._window_end:
+            heapq.heappush(self._heap, scheduled_at)
+
+    def _drain_loop(self):
+        """Drain thread: one drain per request (requests made during a drain run it again)"""
+        while True:
+            self._drain_requested.wait()
+            self._drain_requested.clear()
+            try:
+                drain_outbox()
+            except Exception as e:
+                logger.error(f"Unexpected error draining the outbox: {str(e)}")
+
+    def request_drain(self):
+        """Have the drain thread deliver what was just enqueued, without waiting for it"""
+        if self._drain_thread is None or not self._drain_thread.is_alive():
+            self._drain_thread = threading.Thread(target=self._drain_loop, name="outbox-drain", daemon=True)
+            self._drain_thread.start()
+        self._drain_requested.set()
+
+    def run_once(self) -> float:
+        """One loop step; returns how long to wait for before the next step"""
+        now = datetime.now(timezone.utc)
+
+        if self._heap and self._heap[0] <= now:
+            cutoff = process_overdue_notifications() or now
+            # Deliver right away; separate outbox senders (if any) share the work and take the retries
+            self.request_drain()
+            self._processed_until = cutoff
+            self._retry_at = cutoff + self.retry_delay
+            self.refill()
+            return 0
+
+        if self._window_end is None or now >= self._window_end:
+            self.refill()
+            return 0
+
+        if now >= self._receipts_at:
+            check_push_receipts()
+            purge_outbox()
+            self._receipts_at = datetime.now(timezone.utc) + self.receipt_interval
+            return 0
+
+        wake_at = min(self._heap[0], self._window_end) if self._heap else self._window_end
+        wake_at = min(wake_at, self._receipts_at)
+        return min((wake_at - now).total_seconds(), self.max_sleep)
+
+    def run(self):
+        logger.info("Starting notification dispatcher...")
+        if engine.dialect.name != "postgresql":
+            logger.warning("Not on Postgres, the dispatcher can't be woken early and relies on refills")
+
+        while True:
+            try:
+                timeout = self.run_once()
+                if timeout > 0:
+                    self.listener.ensure_connected()
+                    for payload in self.listener.wait(timeout):
+                        self.push(payload)
+            except KeyboardInterrupt:
+                logger.info("Dispatcher stopped by user")
+                break
+            except Exception as e:
+                logger.error(f"Unexpected error in dispatcher: {str(e)}")
+                # Start over with a fresh LISTEN connection and heap
+                self.listener.close()
+                self._window_end = None
+                time.sleep(5)
+
+        self.listener.close()
+
+
+def main():
+    NotificationDispatcher().run()
+
+
+if __name__ == "__main__":
+    main()
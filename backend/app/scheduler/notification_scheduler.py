@@ -1,20 +1,27 @@
 #!/usr/bin/env python3
 """
-Notification Scheduler Worker - Cron job to process overdue notifications
-Runs every 5 minutes to check for and process overdue notifications
+Notification Scheduler Worker - enqueues overdue notifications in the delivery outbox
+Runs once per invocation (cron), or with --continuous as the event-driven dispatcher
+that wakes up when the next notification is due
 """
 
 import logging
-import time
-import requests
-import json
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional, Set, Tuple
+from sqlalchemy import tuple_, update
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.config import settings
 from app.database import get_db
-from app.models.models import Notification, User, Coin, UserPushToken, Log
+from app.crud.crud import dialect_insert
+from app.models.models import Notification, NotificationOutbox, Coin, CoinPrice, UserPushToken
+from app.services.expo_client import expo_client, run_sync
+from app.services.log_writer import notification_log_writer
+from app.services.price_snapshot import as_utc
+from app.services.push_receipts import check_push_receipts
+from app.utils.recurrence import next_fire_times
 
 # Set up basic logging
 logging.basicConfig(
@@ -24,98 +31,99 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def get_overdue_notifications(db: Session) -> List[Notification]:
-    """Get all active notifications that are overdue"""
-    now = datetime.now(timezone.utc)
-    
-    logger.info(f"Current UTC time: {now}")
-    logger.info(f"Looking for notifications with next_scheduled_at <= {now}")
-    
-    overdue_notifications = db.query(Notification).filter(
-        Notification.is_active == True,
-        Notification.next_scheduled_at <= now
-    ).all()
-    
-    # Debug: Log all notifications and their scheduled times
-    all_notifications = db.query(Notification).filter(
-        Notification.is_active == True
-    ).all()
-    
-    for notif in all_notifications:
-        scheduled_time = notif.next_scheduled_at
-        is_overdue = scheduled_time <= now if scheduled_time else False
-        logger.info(f"Notification {notif.id}: scheduled_at={scheduled_time}, is_overdue={is_overdue}")
-    
-    logger.info(f"Found {len(overdue_notifications)} overdue notifications")
-    return overdue_notifications
+def due_notifications_query(db: Session):
+    """
+    One joined, column-only query for everything a push needs: schedule fields,
+    coin, latest price and push token. auth.users is never touched, the
+    notification's user_id is enough to find the push token.
+    """
+    return db.query(
+        Notification.id,
+        Notification.user_id,
+        Notification.coin_id,
+        Notification.frequency_type,
+        Notification.interval_hours,
+        Notification.preferred_time,
+        Notification.preferred_day,
+        Notification.next_scheduled_at,
+        Coin.symbol.label("coin_symbol"),
+        Coin.name.label("coin_name"),
+        CoinPrice.price,
+        CoinPrice.change,
+        CoinPrice.is_positive,
+        UserPushToken.push_token
+    ).join(
+        Coin, Coin.id == Notification.coin_id
+    ).outerjoin(
+        CoinPrice, CoinPrice.coin_id == Notification.coin_id
+    ).outerjoin(
+        UserPushToken, UserPushToken.user_id == Notification.user_id
+    )
 
-def calculate_next_scheduled_time(
-    frequency_type: str,
-    interval_hours: int = None,
-    preferred_time_str: str = None,
-    preferred_day: str = None
-) -> datetime:
-    """Calculate the next scheduled notification time with proper timezone handling"""
-    now = datetime.now(timezone.utc)
-    
-    if frequency_type == 'hourly':
-        # Set to next full hour
-        next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
-        return next_hour
-    
-    elif frequency_type == 'custom' and interval_hours:
-        next_time = now + timedelta(hours=interval_hours)
-        return next_time
+def iter_overdue_notifications(
+    db: Session,
+    now: datetime,
+    batch_size: int = None,
+    digest_window: Optional[timedelta] = None
+) -> Iterator[List[Row]]:
+    """
+    Claim overdue active notifications (rows from due_notifications_query) in batches.
+    Each batch is locked with FOR UPDATE OF notifications SKIP LOCKED, so any number of
+    workers can drain the queue in parallel: rows claimed by one worker are skipped by
+    the others. The caller must commit (or roll back) each batch before asking for the
+    next one, which releases its locks.
+    Batches are keyset-paginated on (next_scheduled_at, id), served by the partial
+    ix_notifications_due index. Rows left overdue (failed sends) are not revisited in this run.
+    With a digest_window, each batch also claims the other notifications of its users
+    that are due within now + digest_window, so they can be coalesced into one push.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_CLAIM_BATCH_SIZE
+    logger.info(f"Looking for notifications with next_scheduled_at <= {now}")
     
-    elif frequency_type == 'daily' and preferred_time_str:
-        # Parse preferred time
-        preferred_time_obj = datetime.strptime(preferred_time_str, '%H:%M').time()
+    claimed_ids: Set[Any] = set()
+    last_key = None
+    while True:
+        query = due_notifications_query(db).filter(
+            Notification.is_active == True,
+            Notification.next_scheduled_at <= now
+        )
+        if last_key is not None:
+            query = query.filter(tuple_(Notification.next_scheduled_at, Notification.id) > last_key)
         
-        # Create datetime for today at preferred time (UTC)
-        today_preferred = datetime.combine(now.date(), preferred_time_obj, tzinfo=timezone.utc)
+        rows = query.order_by(
+            Notification.next_scheduled_at, Notification.id
+        ).limit(batch_size).with_for_update(of=Notification, skip_locked=True).all()
         
-        # If the time has already passed today, schedule for tomorrow
-        if today_preferred <= now:
-            next_time = today_preferred + timedelta(days=1)
-        else:
-            next_time = today_preferred
-            
-        return next_time
-    
-    elif frequency_type == 'weekly' and preferred_time_str and preferred_day:
-        # Parse preferred time
-        preferred_time_obj = datetime.strptime(preferred_time_str, '%H:%M').time()
-        preferred_day_num = convert_day_name_to_number(preferred_day) if isinstance(preferred_day, str) else preferred_day
+        if not rows:
+            return
         
-        # Calculate days until preferred day
-        current_weekday = now.weekday()  # Monday is 0
-        days_ahead = preferred_day_num - current_weekday
+        # Rows already claimed as digest siblings of an earlier batch are done for this run
+        batch = [row for row in rows if row.id not in claimed_ids]
+        if digest_window is not None and batch:
+            batch += claim_digest_siblings(db, batch, now + digest_window, claimed_ids)
+            claimed_ids.update(row.id for row in batch)
         
-        if days_ahead <= 0:  # Target day has already happened this week or is today
-            days_ahead += 7
+        if batch:
+            yield batch
         
-        next_date = now.date() + timedelta(days=days_ahead)
-        next_time = datetime.combine(next_date, preferred_time_obj, tzinfo=timezone.utc)
+        if len(rows) < batch_size:
+            return
+        last_key = (rows[-1].next_scheduled_at, rows[-1].id)
 
-        return next_time
-    
-    # Fallback - schedule for 1 hour from now
-    fallback_time = now + timedelta(hours=1)
-    return fallback_time.replace(tzinfo=timezone.utc)
-
-def convert_day_name_to_number(day_name) -> int:
-    """Convert day name to number (0=Monday, 6=Sunday) - handles both string and int"""
-    if isinstance(day_name, int):
-        return day_name
-    
-    if isinstance(day_name, str):
-        days_map = {
-            'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
-            'friday': 4, 'saturday': 5, 'sunday': 6
-        }
-        return days_map.get(day_name.lower(), 0)
-    
-    return 0
+def claim_digest_siblings(db: Session, batch: List[Row], due_before: datetime, claimed_ids: Set[Any]) -> List[Row]:
+    """
+    Claim (SKIP LOCKED) the other active notifications of the batch's users that are
+    due before due_before and not yet handled in this run
+    """
+    batch_ids = {row.id for row in batch}
+    siblings = due_notifications_query(db).filter(
+        Notification.is_active == True,
+        Notification.next_scheduled_at <= due_before,
+        Notification.user_id.in_({row.user_id for row in batch})
+    ).order_by(
+        Notification.next_scheduled_at, Notification.id
+    ).with_for_update(of=Notification, skip_locked=True).all()
+    return [row for row in siblings if row.id not in batch_ids and row.id not in claimed_ids]
 
 def debug_notification_times():
     """Debug function to check all notification times"""
@@ -128,12 +136,10 @@ def debug_notification_times():
             now = datetime.now(timezone.utc)
             logger.info(f"Current UTC time: {now}")
             
-            # Get all active notifications
+            # Stream all active notifications
             all_notifications = db.query(Notification).filter(
                 Notification.is_active == True
-            ).all()
-            
-            logger.info(f"Found {len(all_notifications)} active notifications:")
+            ).yield_per(1000)
             
             for i, notif in enumerate(all_notifications):
                 scheduled_time = notif.next_scheduled_at
@@ -169,254 +175,147 @@ def debug_notification_times():
 # Add this to your main function for debugging
 def process_overdue_notifications_with_debug():
     """Main function to process all overdue notifications with debug info"""
-    logger.info("Starting notification scheduler check...")
-    
     # Add debug info
     debug_notification_times()
     
-    try:
-        # Get database session
-        db = next(get_db())
-        
-        try:
-            # Get all overdue notifications
-            overdue_notifications = get_overdue_notifications(db)
-            
-            if not overdue_notifications:
-                logger.info("No overdue notifications found")
-                return
-            
-            logger.info(f"Found {len(overdue_notifications)} overdue notifications")
-            
-            # Process each overdue notification
-            for notification in overdue_notifications:
-                try:
-                    logger.info(f"Processing notification {notification.id} for user {notification.user_id}")
-                    
-                    # Send notification to client
-                    success = send_notification_to_client(notification, db)
-                    
-                    if success:
-                        # Update notification schedule
-                        update_notification_schedule(notification, db)
-                        
-                        # Commit changes for this notification
-                        db.commit()
-                        
-                        logger.info(f"Successfully processed notification {notification.id}")
-                    else:
-                        logger.error(f"Failed to send notification {notification.id}")
-                        db.rollback()
-                    
-                except Exception as e:
-                    logger.error(f"Error processing notification {notification.id}: {str(e)}")
-                    db.rollback()
-                    continue
-            
-        finally:
-            db.close()
-            
-    except SQLAlchemyError as e:
-        logger.error(f"Database error in notification scheduler: {str(e)}")
-    except Exception as e:
-        logger.error(f"Unexpected error in notification scheduler: {str(e)}")
+    process_overdue_notifications()
 
-def send_notification_to_client(notification: Notification, db: Session):
+def render_coin_payload(notification: Row) -> Dict[str, Any]:
     """
-    Send notification to React Native Expo client
-    Sends push notification via Expo Push API
+    Render the part of a push that is the same for every follower of a coin:
+    title, body and data (without notification_id), from the row's coin and price.
     """
-    try:
-        # Get user and coin data for the notification
-        user = db.query(User).filter(User.id == notification.user_id).first()
-        coin = db.query(Coin).filter(Coin.id == notification.coin_id).first()
-        
-        if not user:
-            logger.error(f"User not found for notification {notification.id}")
-            return False
-            
-        if not coin:
-            logger.error(f"Coin not found for notification {notification.id}")
-            return False
-        
-        # Get user's push token
-        push_token_record = db.query(UserPushToken).filter(
-            UserPushToken.user_id == notification.user_id
-        ).first()
-        
-        if not push_token_record:
-            logger.warning(f"No push token found for user {notification.user_id}")
-            return False
-            
-        # Get current coin price for the notification
-        coin_price = None
-        current_price = "N/A"
-        price_change = "N/A"
-        
-        if coin.price:  # Assuming coin has a price relationship
-            coin_price = coin.price
-            current_price = f"${float(coin_price.price):,.2f}"
-            if coin_price.change is not None:
-                change_symbol = "📈" if coin_price.is_positive else "📉"
-                price_change = f"{change_symbol} {float(coin_price.change):+.2f}%"
-        
-        # Create notification message
-        title = f"{coin.symbol} Price Update"
-        body = f"{coin.name} is currently at {current_price}"
-        if price_change != "N/A":
-            body += f" ({price_change})"
-        
-        # Prepare the push notification payload
-        expo_message = {
-            "to": push_token_record.push_token,
-            "title": title,
-            "body": body,
-            "data": {
-                "coin_id": coin.id,
-                "coin_symbol": coin.symbol,
-                "coin_name": coin.name,
-                "current_price": float(coin_price.price) if coin_price else None,
-                "price_change": float(coin_price.change) if coin_price and coin_price.change else None,
-                "is_positive": coin_price.is_positive if coin_price else None,
-                "notification_id": str(notification.id),
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            },
-            "sound": "default",
-            "badge": 1,
-            "priority": "high"
-        }
-        
-        # Send the notification
-        response = send_expo_push_notification(expo_message)
-        
-        if response and response.get('status') == 'ok':
-            log_notification(notification, coin_price, db)
-            logger.info(f"Successfully sent notification to user {notification.user_id} for coin {coin.symbol}")
-            return True
-        else:
-            logger.error(f"Failed to send notification: {response}")
-            return False
-            
-    except Exception as e:
-        logger.error(f"Error sending notification {notification.id}: {str(e)}")
-        return False
-    
-def send_expo_push_notification(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # Get current coin price for the notification
+    current_price = "N/A"
+    price_change = "N/A"
+    
+    if notification.price is not None:
+        current_price = f"${float(notification.price):,.2f}"
+        if notification.change is not None:
+            change_symbol = "📈" if notification.is_positive else "📉"
+            price_change = f"{change_symbol} {float(notification.change):+.2f}%"
+    
+    # Create notification message
+    title = f"{notification.coin_symbol} Price Update"
+    body = f"{notification.coin_name} is currently at {current_price}"
+    if price_change != "N/A":
+        body += f" ({price_change})"
+    
+    return {
+        "title": title,
+        "body": body,
+        "data": {
+            "coin_id": notification.coin_id,
+            "coin_symbol": notification.coin_symbol,
+            "coin_name": notification.coin_name,
+            "current_price": float(notification.price) if notification.price is not None else None,
+            "price_change": float(notification.change) if notification.change else None,
+            "is_positive": notification.is_positive,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        },
+        "sound": "default",
+        "badge": 1,
+        "priority": "high"
+    }
+
+def build_expo_message(notification: Row, payload_cache: Optional[Dict[int, Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
     """
-    Send a push notification via Expo Push API
-    
-    Args:
-        message: The notification message payload
-        
-    Returns:
-        Response from Expo API or None if failed
+    Build the Expo push message for a row from due_notifications_query.
+    With a payload_cache (coin_id -> rendered payload, one per run) each coin is
+    rendered once, from the price of its first row, and per-user messages only
+    add the token and notification ID.
+    Returns None if the notification can't be sent.
     """
-    expo_url = "https://exp.host/--/api/v2/push/send"
+    if not notification.push_token:
+        logger.warning(f"No push token found for user {notification.user_id}")
+        return None
     
-    headers = {
-        'Accept': 'application/json',
-        'Accept-encoding': 'gzip, deflate',
-        'Content-Type': 'application/json',
-    }
+    payload = payload_cache.get(notification.coin_id) if payload_cache is not None else None
+    if payload is None:
+        payload = render_coin_payload(notification)
+        if payload_cache is not None:
+            payload_cache[notification.coin_id] = payload
     
-    try:
-        logger.info(f"Sending push notification to token: {message['to'][:10]}...")
-        
-        response = requests.post(
-            expo_url,
-            data=json.dumps(message),
-            headers=headers,
-            timeout=30
-        )
-        
-        response.raise_for_status()  # Raise an exception for bad status codes
-        
-        response_data = response.json()
-        logger.info(f"Expo API response: {response_data}")
-        
-        # Check for Expo-specific errors
-        if 'data' in response_data and response_data['data']:
-            ticket = response_data['data']
-            if ticket.get('status') == 'ok':
-                return {'status': 'ok', 'data': ticket}
-            elif ticket.get('status') == 'error':
-                error_details = ticket.get('details', {})
-                error_message = error_details.get('error', 'Unknown error')
-                logger.error(f"Expo push notification error: {error_message}")
-                
-                # Handle specific error cases
-                if error_message == 'DeviceNotRegistered':
-                    logger.warning("Device not registered - token may be invalid")
-                elif error_message == 'InvalidCredentials':
-                    logger.error("Invalid Expo credentials")
-                elif error_message == 'MessageTooBig':
-                    logger.error("Notification message too big")
-                    
-                return {'status': 'error', 'details': error_details}
-        
-        return response_data
-        
-    except requests.exceptions.Timeout:
-        logger.error("Timeout while sending push notification")
-        return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Request error while sending push notification: {str(e)}")
-        return None
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error in push notification response: {str(e)}")
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error sending push notification: {str(e)}")
-        return None
+    # Shallow copies: the shared payload itself is never modified
+    expo_message = dict(payload)
+    expo_message["to"] = notification.push_token
+    expo_message["data"] = dict(payload["data"], notification_id=str(notification.id))
+    
+    return expo_message
+
+def build_digest_message(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Coalesce one user's messages (same token) into a single push listing every coin"""
+    symbols = ", ".join(message["data"]["coin_symbol"] for message in messages)
+    return {
+        "to": messages[0]["to"],
+        "title": f"{symbols} Price Update",
+        "body": "\n".join(message["body"] for message in messages),
+        "data": {
+            "digest": True,
+            "coins": [message["data"] for message in messages]
+        },
+        "sound": "default",
+        "badge": 1,
+        "priority": "high"
+    }
+
+def coalesce_digests(pending: List[Tuple[List[Row], Dict[str, Any]]]) -> List[Tuple[List[Row], Dict[str, Any]]]:
+    """
+    Group single-notification messages by user into digests of at most
+    NOTIFICATION_DIGEST_MAX_COINS coins (keeps the push under Expo's size limit)
+    """
+    by_user: Dict[Any, List[Tuple[Row, Dict[str, Any]]]] = {}
+    for (notification,), message in pending:
+        by_user.setdefault(notification.user_id, []).append((notification, message))
+    
+    max_coins = settings.NOTIFICATION_DIGEST_MAX_COINS
+    digests = []
+    for entries in by_user.values():
+        for start in range(0, len(entries), max_coins):
+            group = entries[start:start + max_coins]
+            if len(group) == 1:
+                digests.append(([group[0][0]], group[0][1]))
+            else:
+                digests.append((
+                    [notification for notification, _ in group],
+                    build_digest_message([message for _, message in group])
+                ))
+    return digests
 
-def send_batch_expo_notifications(messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+def log_expo_ticket_error(ticket: Dict[str, Any], notification_id=None):
+    """Log an Expo error ticket, with hints for the error codes we know"""
+    error_details = ticket.get('details') or {}
+    error_message = error_details.get('error', ticket.get('message', 'Unknown error'))
+    logger.error(f"Expo push notification error for notification {notification_id}: {error_message}")
+    
+    # Handle specific error cases
+    if error_message == 'DeviceNotRegistered':
+        logger.warning("Device not registered - token may be invalid")
+    elif error_message == 'InvalidCredentials':
+        logger.error("Invalid Expo credentials")
+    elif error_message == 'MessageTooBig':
+        logger.error("Notification message too big")
+    
+def send_batch_expo_notifications(batches: List[List[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
     """
-    Send multiple push notifications in a batch via Expo Push API
-    More efficient for sending many notifications at once
+    Send several push requests (at most EXPO_MAX_BATCH_SIZE messages each) via
+    the pooled Expo client; up to EXPO_MAX_IN_FLIGHT of them are in flight at once
     
     Args:
-        messages: List of notification message payloads
+        batches: Lists of notification message payloads, one per request
         
     Returns:
-        Response from Expo API or None if failed
+        Response from Expo API (or None if failed) for each batch, in order
     """
-    expo_url = "https://exp.host/--/api/v2/push/send"
-    
-    headers = {
-        'Accept': 'application/json',
-        'Accept-encoding': 'gzip, deflate',
-        'Content-Type': 'application/json',
-    }
-    
     try:
-        logger.info(f"Sending batch of {len(messages)} push notifications")
+        logger.info(f"Sending {sum(len(batch) for batch in batches)} push notifications in {len(batches)} requests")
+        responses = run_sync(expo_client.send_many(batches))
+        logger.info(f"Expo batch API response: {sum(len((r or {}).get('data') or []) for r in responses)} tickets")
+        return responses
         
-        response = requests.post(
-            expo_url,
-            data=json.dumps(messages),
-            headers=headers,
-            timeout=60  # Longer timeout for batch requests
-        )
-        
-        response.raise_for_status()
-        
-        response_data = response.json()
-        logger.info(f"Expo batch API response: {response_data}")
-        
-        return response_data
-        
-    except requests.exceptions.Timeout:
-        logger.error("Timeout while sending batch push notifications")
-        return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Request error while sending batch push notifications: {str(e)}")
-        return None
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error in batch push notification response: {str(e)}")
-        return None
     except Exception as e:
         logger.error(f"Unexpected error sending batch push notifications: {str(e)}")
-        return None
+        return [None] * len(batches)
 
 # Helper function to validate Expo push tokens
 def is_valid_expo_push_token(token: str) -> bool:
@@ -438,40 +337,92 @@ def is_valid_expo_push_token(token: str) -> bool:
         and len(token) > 20
     )
         
-def update_notification_schedule(notification: Notification, db: Session):
-    """Update notification timestamps after processing"""
-    now = datetime.now(timezone.utc)
-    
-    # Convert preferred_day back to string for calculation
-    preferred_day_str = None
-    if notification.preferred_day is not None:
-        day_names = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-        preferred_day_str = day_names[notification.preferred_day]
-    
-    # Convert preferred_time back to string for calculation
-    preferred_time_str = None
-    if notification.preferred_time:
-        preferred_time_str = notification.preferred_time.strftime('%H:%M')
-    
-    # Calculate next scheduled time
-    next_scheduled_at = calculate_next_scheduled_time(
-        notification.frequency_type,
-        notification.interval_hours,
-        preferred_time_str,
-        preferred_day_str
-    )
+def advance_notification_schedules(notifications: List[Any], db: Session):
+    """
+    Set last_sent_at / next_scheduled_at for a whole batch of enqueued notifications
+    in one executemany UPDATE (ORM bulk update by primary key). Commit is left to
+    the caller, once per batch.
+    """
+    if not notifications:
+        return
     
-    # Use db.query().update() instead of object modification
-    db.query(Notification).filter(Notification.id == notification.id).update({
-        'last_sent_at': now,
-        'next_scheduled_at': next_scheduled_at,
-        'updated_at': now
-    })
+    now = datetime.now(timezone.utc)
+    # Rows claimed before their slot (digest siblings) advance past that slot, not past now
+    base_times = [
+        max(now, as_utc(notification.next_scheduled_at)) if notification.next_scheduled_at else now
+        for notification in notifications
+    ]
+    # One vectorized pass for the whole batch
+    next_times = next_fire_times(notifications, base_times)
+    params = [
+        {
+            'id': notification.id,
+            'last_sent_at': now,
+            'next_scheduled_at': next_scheduled_at,
+            'updated_at': now
+        }
+        for notification, next_scheduled_at in zip(notifications, next_times)
+    ]
+    db.execute(update(Notification), params)
     
-    logger.info(f"Updated notification {notification.id} - next scheduled: {next_scheduled_at}")
+    logger.info(f"Advanced schedule of {len(params)} notifications")
 
-def process_overdue_notifications():
-    """Main function to process all overdue notifications"""
+def enqueue_notification_batch(
+    notifications: List[Row],
+    db: Session,
+    payload_cache: Optional[Dict[int, Dict[str, Any]]] = None
+) -> int:
+    """
+    Render a batch of due notifications into the delivery outbox and advance their
+    schedules, in the caller's transaction (one commit per batch). The outbox key
+    (notification_id, scheduled slot) makes a repeated run a no-op for slots already
+    enqueued. Notifications whose user has no push token are not enqueued but their
+    schedules still advance (nothing to retry); ones that fail to render stay overdue.
+    Returns the number of notifications enqueued.
+    """
+    rows = []
+    enqueued = []
+    skipped = []
+    for notification in notifications:
+        try:
+            message = build_expo_message(notification, payload_cache)
+        except Exception as e:
+            logger.error(f"Error building notification {notification.id}: {str(e)}")
+            continue
+        if message is None:
+            skipped.append(notification)
+            continue
+        rows.append({
+            'notification_id': notification.id,
+            'scheduled_for': notification.next_scheduled_at,
+            'user_id': notification.user_id,
+            'coin_id': notification.coin_id,
+            'push_token': notification.push_token,
+            'message': message
+        })
+        enqueued.append(notification)
+    
+    if skipped:
+        # Left overdue they would be claimed again on every run, for good
+        logger.warning(f"Skipped {len(skipped)} notifications without a push token")
+    
+    if rows:
+        # Consecutive ids per user keep a user's rows in the same sender claim (digest mode)
+        rows.sort(key=lambda row: str(row['user_id']))
+        stmt = dialect_insert(db)(NotificationOutbox).values(rows)
+        db.execute(stmt.on_conflict_do_nothing(
+            index_elements=[NotificationOutbox.notification_id, NotificationOutbox.scheduled_for]
+        ))
+    advance_notification_schedules(enqueued + skipped, db)
+    return len(enqueued)
+
+def process_overdue_notifications() -> Optional[datetime]:
+    """
+    Main function to process all overdue notifications: enqueue them in the delivery
+    outbox (sending is left to the outbox senders, see outbox_sender.py).
+    Returns the cutoff of the run (notifications due at or before it were claimed),
+    or None if the run failed.
+    """
     logger.info("Starting notification scheduler check...")
     
     try:
@@ -479,34 +430,40 @@ def process_overdue_notifications():
         db = next(get_db())
         
         try:
-            # Get all overdue notifications
-            overdue_notifications = get_overdue_notifications(db)
-            
-            if not overdue_notifications:
-                logger.info("No overdue notifications found")
-                return
-            
-            logger.info(f"Found {len(overdue_notifications)} overdue notifications")
+            now = datetime.now(timezone.utc)
+            logger.info(f"Current UTC time: {now}")
             
-            # Process each overdue notification
-            for notification in overdue_notifications:
+            found = 0
+            enqueued = 0
+            # Each coin's payload is rendered once per run and shared by all its followers
+            payload_cache: Dict[int, Dict[str, Any]] = {}
+            # In digest mode a user's upcoming notifications are enqueued together, so
+            # the senders can coalesce them into one push
+            digest_window = None
+            if settings.NOTIFICATION_DIGEST_ENABLED:
+                digest_window = timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW_SECONDS)
+            for claimed in iter_overdue_notifications(db, now, digest_window=digest_window):
+                found += len(claimed)
                 try:
-                    # Send notification to client (TODO: implement)
-                    send_notification_to_client(notification, db)
-                    
-                    # Update notification schedule
-                    update_notification_schedule(notification, db)
-                    
-                    # Commit changes for this notification
+                    # Enqueue and advance the schedules in one transaction per claimed
+                    # batch; the commit also releases the row locks
+                    batch_enqueued = enqueue_notification_batch(claimed, db, payload_cache)
                     db.commit()
-                    
-                    logger.info(f"Successfully processed notification {notification.id}")
+                    enqueued += batch_enqueued
+                    logger.info(f"Enqueued {batch_enqueued}/{len(claimed)} notifications in batch")
                     
                 except Exception as e:
-                    logger.error(f"Error processing notification {notification.id}: {str(e)}")
+                    logger.error(f"Error processing notification batch: {str(e)}")
                     db.rollback()
                     continue
             
+            if not found:
+                logger.info("No overdue notifications found")
+                return now
+            
+            logger.info(f"Successfully enqueued {enqueued}/{found} overdue notifications")
+            return now
+            
         finally:
             db.close()
             
@@ -515,18 +472,26 @@ def process_overdue_notifications():
     except Exception as e:
         logger.error(f"Unexpected error in notification scheduler: {str(e)}")
         
-def log_notification(notification: Notification, coin_price, db: Session):
-    """Store notification in logs table"""
+def log_notification(notification: Row, data: Optional[Dict[str, Any]] = None):
+    """
+    Queue the logs row for a sent notification (a row from due_notifications_query).
+    With the pushed message's data the row records the price that was actually sent.
+    Rows are written in bulk by the buffered log writer, not by the dispatch transaction.
+    """
+    if data is not None:
+        price, change, symbol = data['current_price'], data['price_change'], data['coin_symbol']
+    else:
+        price = float(notification.price) if notification.price is not None else None
+        change = float(notification.change) if notification.change else None
+        symbol = notification.coin_symbol
     try:
-        log_entry = Log(
-            user_id=notification.user_id,
-            coin_id=notification.coin_id,
-            price=float(coin_price.price) if coin_price else 0,
-            change_percent=float(coin_price.change) if coin_price and coin_price.change else None,
-            message=f"Push notification sent for {notification.coin.symbol}"
-        )
-        db.add(log_entry)
-        logger.info(f"Logged notification for user {notification.user_id}")
+        notification_log_writer.add({
+            'user_id': notification.user_id,
+            'coin_id': notification.coin_id,
+            'price': price if price is not None else 0,
+            'change_percent': change,
+            'message': f"Push notification sent for {symbol}"
+        })
     except Exception as e:
         logger.error(f"Error logging notification: {str(e)}")
 
@@ -534,31 +499,35 @@ def main():
     """Main entry point for the cron job"""
     logger.info("Notification scheduler worker started")
     
-    # For cron job - run once and exit
-    process_overdue_notifications_with_debug()
+    # For cron job - run once and exit; the per-notification dump only in diagnostic mode
+    if settings.NOTIFICATION_DIAGNOSTICS:
+        process_overdue_notifications_with_debug()
+    else:
+        process_overdue_notifications()
+    
+    # Send what was just enqueued (plus retries that are due), then the periodic
+    # housekeeping: receipts and outbox retention
+    from app.scheduler.outbox_sender import drain_outbox, purge_outbox
+    
+    drain_outbox()
+    check_push_receipts()
+    purge_outbox()
     
     logger.info("Notification scheduler worker completed")
 
 def run_continuous():
-    """Run the scheduler continuously every 5 minutes (for testing)"""
-    logger.info("Starting continuous notification scheduler...")
+    """Run the event-driven dispatcher (sleeps until the next due notification)"""
+    from app.scheduler.notification_dispatcher import NotificationDispatcher
     
-    while True:
-        try:
-            process_overdue_notifications()
-            logger.info("Sleeping for 5 minutes...")
-            time.sleep(300)  # 5 minutes
-        except KeyboardInterrupt:
-            logger.info("Scheduler stopped by user")
-            break
-        except Exception as e:
-            logger.error(f"Unexpected error in continuous mode: {str(e)}")
-            time.sleep(60)  # Wait 1 minute before retrying
+    NotificationDispatcher().run()
 
 if __name__ == "__main__":
     import sys
     
-    if len(sys.argv) > 1 and sys.argv[1] == "--continuous":
+    if "--debug" in sys.argv[1:]:
+        settings.NOTIFICATION_DIAGNOSTICS = True
+    
+    if "--continuous" in sys.argv[1:]:
         run_continuous()
     else:
         main()
\ No newline at end of file
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Outbox Sender - drains the notification delivery outbox.
+Claims pending rows with FOR UPDATE SKIP LOCKED (any number of senders can run
+side by side), sends them through the pooled Expo client and records the
+outcome: sent, retried later with exponential backoff, or failed for good.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import get_db
+from app.models.models import NotificationOutbox
+from app.scheduler.notification_scheduler import (
+    coalesce_digests,
+    log_expo_ticket_error,
+    log_notification,
+    send_batch_expo_notifications
+)
+from app.services.expo_client import EXPO_MAX_BATCH_SIZE
+from app.services.log_writer import notification_log_writer
+from app.services.price_snapshot import as_utc
+from app.services.push_receipts import prune_push_tokens, record_push_tickets
+from app.utils.rate_limit import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Ticket errors that no retry will fix
+PERMANENT_ERRORS = {"DeviceNotRegistered", "MessageTooBig"}
+
+
+def claim_outbox_batch(db: Session, now: datetime, batch_size: int) -> List[Row]:
+    """Lock the next pending rows that are due (served by ix_notification_outbox_pending)"""
+    return db.query(
+        NotificationOutbox.id,
+        NotificationOutbox.notification_id,
+        NotificationOutbox.user_id,
+        NotificationOutbox.coin_id,
+        NotificationOutbox.push_token,
+        NotificationOutbox.message,
+        NotificationOutbox.attempts
+    ).filter(
+        NotificationOutbox.status == "pending",
+        NotificationOutbox.next_attempt_at <= now
+    ).order_by(
+        NotificationOutbox.next_attempt_at, NotificationOutbox.id
+    ).limit(batch_size).with_for_update(skip_locked=True).all()
+
+
+def attempt_params(row: Row, now: datetime, error: str = None, permanent: bool = False, ticket_id: str = None) -> Dict[str, Any]:
+    """UPDATE parameters for one outbox row after a send attempt"""
+    attempts = row.attempts + 1
+    if error is None:
+        status, next_attempt_at = "sent", now
+    elif permanent or attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        status, next_attempt_at = "failed", now
+    else:
+        status = "pending"
+        delay = backoff_delay(attempts - 1, base=settings.OUTBOX_RETRY_BASE_SECONDS, cap=settings.OUTBOX_RETRY_MAX_SECONDS)
+        next_attempt_at = now + timedelta(seconds=delay)
+    return {
+        'id': row.id,
+        'status': status,
+        'attempts': attempts,
+        'next_attempt_at': next_attempt_at,
+        'last_error': error,
+        'ticket_id': ticket_id,
+        'sent_at': now if error is None else None
+    }
+
+
+def send_outbox_batch(rows: List[Row], db: Session, digest: bool = False) -> int:
+    """
+    Send claimed outbox rows as EXPO_MAX_BATCH_SIZE-message requests, all in flight
+    together (ticket i of a request belongs to its message i), and record each row's
+    outcome in one executemany UPDATE. Sent rows get their log row and push ticket,
+    DeviceNotRegistered tokens are pruned. In digest mode a user's rows go out as one push.
+    Returns the number of rows sent.
+    """
+    pending = [([row], row.message) for row in rows]
+    if digest:
+        pending = coalesce_digests(pending)
+
+    chunks = [pending[start:start + EXPO_MAX_BATCH_SIZE] for start in range(0, len(pending), EXPO_MAX_BATCH_SIZE)]
+    responses = send_batch_expo_notifications([[message for _, message in chunk] for chunk in chunks])
+
+    now = datetime.now(timezone.utc)
+    outcomes = []
+    tickets_to_check = []
+    dead_tokens = set()
+    for chunk, response in zip(chunks, responses):
+        tickets = response.get('data') if response else None
+        if not isinstance(tickets, list) or len(tickets) != len(chunk):
+            error = str(response.get('errors')) if response else "no response"
+            logger.error(f"Batch of {len(chunk)} notifications failed: {error}")
+            outcomes.extend(attempt_params(row, now, error) for group, _ in chunk for row in group)
+            continue
+
+        for (group, message), ticket in zip(chunk, tickets):
+            first = group[0]
+            if ticket.get('status') == 'ok':
+                for row, data in zip(group, message['data'].get('coins') or [message['data']]):
+                    log_notification(row, data)
+                outcomes.extend(attempt_params(row, now, ticket_id=ticket.get('id')) for row in group)
+                if ticket.get('id'):
+                    tickets_to_check.append({
+                        'id': ticket['id'],
+                        'notification_id': first.notification_id,
+                        'user_id': first.user_id,
+                        'push_token': first.push_token
+                    })
+            else:
+                log_expo_ticket_error(ticket, first.notification_id)
+                error = (ticket.get('details') or {}).get('error') or ticket.get('message', 'Unknown error')
+                if error == 'DeviceNotRegistered':
+                    dead_tokens.add(first.push_token)
+                outcomes.extend(attempt_params(row, now, error, error in PERMANENT_ERRORS) for row in group)
+
+    record_push_tickets(db, tickets_to_check)
+    prune_push_tokens(db, dead_tokens)
+    db.execute(update(NotificationOutbox), outcomes)
+
+    sent = sum(1 for params in outcomes if params['status'] == 'sent')
+    failed = sum(1 for params in outcomes if params['status'] == 'failed')
+    logger.info(f"Outbox batch: {sent} sent, {failed} failed, {len(outcomes) - sent - failed} to retry")
+    return sent
+
+
+def drain_outbox() -> int:
+    """
+    Send every pending outbox row that is due, one claimed batch (and transaction)
+    at a time. Returns the number of rows sent.
+    """
+    batch_size = settings.OUTBOX_CLAIM_BATCH_SIZE
+    digest = settings.NOTIFICATION_DIGEST_ENABLED
+    sent = 0
+
+    db = next(get_db())
+    try:
+        while True:
+            rows = claim_outbox_batch(db, datetime.now(timezone.utc), batch_size)
+            if not rows:
+                break
+            try:
+                sent += send_outbox_batch(rows, db, digest)
+                db.commit()
+            except Exception as e:
+                # Leave the rows pending for the next drain rather than spinning on them
+                logger.error(f"Error sending outbox batch: {str(e)}")
+                db.rollback()
+                break
+            if len(rows) < batch_size:
+                break
+        return sent
+
+    except Exception as e:
+        logger.error(f"Unexpected error draining the outbox: {str(e)}")
+        db.rollback()
+        return sent
+    finally:
+        db.close()
+        # Whatever the outcome, don't leave this drain's log rows in the buffer
+        notification_log_writer.flush()
+
+
+def purge_outbox() -> int:
+    """
+    Drop sent/failed rows older than OUTBOX_RETENTION_DAYS (served by the partial
+    ix_notification_outbox_done index). Periodic job, run alongside receipt polling.
+    Returns the number of rows deleted.
+    """
+    db = next(get_db())
+    try:
+        retention_cutoff = datetime.now(timezone.utc) - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+        result = db.execute(delete(NotificationOutbox).where(
+            NotificationOutbox.status != "pending",
+            NotificationOutbox.created_at < retention_cutoff
+        ))
+        db.commit()
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} outbox rows")
+        return result.rowcount
+    except Exception as e:
+        logger.error(f"Error purging the outbox: {str(e)}")
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+
+def seconds_until_next_attempt() -> float:
+    """Time until the earliest pending row is due, capped at OUTBOX_POLL_SECONDS"""
+    db = next(get_db())
+    try:
+        next_attempt_at = db.query(func.min(NotificationOutbox.next_attempt_at)).filter(
+            NotificationOutbox.status == "pending"
+        ).scalar()
+    finally:
+        db.close()
+
+    if next_attempt_at is None:
+        return settings.OUTBOX_POLL_SECONDS
+    wait = (as_utc(next_attempt_at) - datetime.now(timezone.utc)).total_seconds()
+    # At least a second, so rows left pending by an error aren't retried in a tight loop
+    return min(max(wait, 1.0), settings.OUTBOX_POLL_SECONDS)
+
+
+def run_continuous():
+    """Sender worker loop: drain, then sleep until the next retry or poll"""
+    logger.info("Starting outbox sender...")
+
+    while True:
+        try:
+            drain_outbox()
+            time.sleep(seconds_until_next_attempt())
+        except KeyboardInterrupt:
+            logger.info("Outbox sender stopped by user")
+            break
+        except Exception as e:
+            logger.error(f"Unexpected error in outbox sender: {str(e)}")
+            time.sleep(5)
+
+
+def main():
+    import sys
+
+    if "--continuous" in sys.argv[1:]:
+        run_continuous()
+    else:
+        drain_outbox()
+
+
+if __name__ == "__main__":
+    main()
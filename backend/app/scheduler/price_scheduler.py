@@ -1,7 +1,10 @@
 # scheduler/price_scheduler.py
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from app.services.price_service import update_all_coin_prices
+from apscheduler.triggers.cron import CronTrigger
+from app.services.price_service import update_all_coin_prices, prune_price_history, sync_price_snapshot
+from app.services.leader import LeaderElector
+from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,7 +15,12 @@ class PriceScheduler:
         
     def start(self):
         """Start the price update scheduler"""
+        if self.scheduler.running:
+            return
         try:
+            # A fresh scheduler each time, as leadership may be lost and regained
+            self.scheduler = AsyncIOScheduler()
+
             # Update prices every 5 minutes (CoinGecko free tier limit)
             self.scheduler.add_job(
                 update_all_coin_prices,
@@ -22,6 +30,15 @@ class PriceScheduler:
                 replace_existing=True
             )
             
+            # Apply price history retention once a day, off-peak
+            self.scheduler.add_job(
+                prune_price_history,
+                trigger=CronTrigger(hour=3, minute=30),
+                id='prune_price_history',
+                name='Prune old price ticks and candles',
+                replace_existing=True
+            )
+            
             # Also run once at startup
             self.scheduler.add_job(
                 update_all_coin_prices,
@@ -40,17 +57,42 @@ class PriceScheduler:
     def stop(self):
         """Stop the scheduler"""
         if self.scheduler.running:
-            self.scheduler.shutdown()
+            self.scheduler.shutdown(wait=False)
             logger.info("Price scheduler stopped")
 
 # Initialize scheduler instance
 price_scheduler = PriceScheduler()
 
+# Every worker/pod runs the election, only the leader runs the scheduler,
+# so upstream calls stay constant however many processes are started
+price_leader = LeaderElector(
+    "crypto_pulse_price_scheduler",
+    on_elected=price_scheduler.start,
+    on_demoted=price_scheduler.stop,
+    check_interval=settings.LEADER_CHECK_INTERVAL_SECONDS
+)
+
+# Runs on every worker: followers reload the prices the leader wrote, so their
+# snapshot and stream subscribers stay current without calling the provider
+snapshot_sync_scheduler = AsyncIOScheduler()
+
 # Add this to your main.py or app startup
 def start_background_tasks():
-    """Call this in your FastAPI startup event"""
-    price_scheduler.start()
+    """Call this in your FastAPI startup (lifespan)"""
+    price_leader.start()
+    if not snapshot_sync_scheduler.running:
+        snapshot_sync_scheduler.add_job(
+            sync_price_snapshot,
+            trigger=IntervalTrigger(seconds=settings.PRICE_SNAPSHOT_SYNC_SECONDS),
+            id='sync_price_snapshot',
+            name='Reload the price snapshot on followers',
+            replace_existing=True
+        )
+        snapshot_sync_scheduler.start()
 
-def stop_background_tasks():
-    """Call this in your FastAPI shutdown event"""
+async def stop_background_tasks():
+    """Call this in your FastAPI shutdown (lifespan)"""
+    if snapshot_sync_scheduler.running:
+        snapshot_sync_scheduler.shutdown(wait=False)
+    await price_leader.stop()
     price_scheduler.stop()
\ No newline at end of file
@@ -46,6 +46,8 @@ class CoinBase(BaseSchema):
     name: str
     symbol: str
     color: str
+    coingecko_id: Optional[str] = None
+    price_change_threshold: Optional[float] = None
 
 class CoinCreate(CoinBase):
     pass
@@ -54,6 +56,8 @@ class CoinUpdate(BaseSchema):
     name: Optional[str] = None
     symbol: Optional[str] = None
     color: Optional[str] = None
+    coingecko_id: Optional[str] = None
+    price_change_threshold: Optional[float] = None
 
 class CoinResponse(CoinBase):
     id: int
@@ -0,0 +1,137 @@
+# services/coin_catalog.py
+import csv
+import json
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.crud.crud import dialect_insert
+from app.models.models import Coin
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COIN_COLOR = "#E6ECEF"
+CATALOG_FIELDS = ("symbol", "name", "color", "coingecko_id")
+IMPORT_CHUNK_SIZE = 1000
+
+@dataclass(frozen=True)
+class CoinIndex:
+    """In-memory provider ID lookup, rebuilt only when the coins table changes"""
+    coin_id_by_gecko_id: Dict[str, int]
+    symbol_by_coin_id: Dict[int, str]
+    # Per-coin write-skip thresholds in percent (only coins that override the default)
+    threshold_by_coin_id: Dict[int, float]
+    fingerprint: Tuple
+
+    @property
+    def gecko_ids(self) -> List[str]:
+        return list(self.coin_id_by_gecko_id)
+
+_coin_index: Optional[CoinIndex] = None
+
+def _catalog_fingerprint(db: Session) -> Tuple:
+    """Cheap single-row aggregate that changes whenever a coin is added, edited or removed"""
+    count, last_change = db.query(func.count(Coin.id), func.max(Coin.updated_at)).one()
+    return (count, last_change)
+
+def get_coin_index(db: Session) -> CoinIndex:
+    """Return the coin index, reloading it only if the catalog changed since the last load"""
+    global _coin_index
+    fingerprint = _catalog_fingerprint(db)
+    if _coin_index is not None and _coin_index.fingerprint == fingerprint:
+        return _coin_index
+
+    rows = (
+        db.query(Coin.id, Coin.symbol, Coin.coingecko_id, Coin.price_change_threshold)
+        .filter(Coin.coingecko_id.isnot(None))
+        .all()
+    )
+    _coin_index = CoinIndex(
+        coin_id_by_gecko_id={gecko_id: coin_id for coin_id, _, gecko_id, _ in rows},
+        symbol_by_coin_id={coin_id: symbol for coin_id, symbol, _, _ in rows},
+        threshold_by_coin_id={
+            coin_id: float(threshold) for coin_id, _, _, threshold in rows if threshold is not None
+        },
+        fingerprint=fingerprint
+    )
+    logger.info(f"Coin index loaded with {len(rows)} mapped coins")
+    return _coin_index
+
+def load_catalog_file(path: str) -> List[dict]:
+    """Read a coin catalog from a .json (list of objects) or .csv (header row) file"""
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+    elif path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            entries = list(csv.DictReader(f))
+    else:
+        raise ValueError("Catalog must be a .json or .csv file")
+
+    catalog = []
+    for entry in entries:
+        symbol = (entry.get("symbol") or "").strip().upper()
+        name = (entry.get("name") or "").strip()
+        if not symbol or not name:
+            logger.warning(f"Skipping catalog entry without symbol/name: {entry}")
+            continue
+        catalog.append({
+            "symbol": symbol,
+            "name": name,
+            "color": (entry.get("color") or "").strip() or DEFAULT_COIN_COLOR,
+            "coingecko_id": (entry.get("coingecko_id") or "").strip() or None
+        })
+    return catalog
+
+def import_catalog(db: Session, catalog: List[dict]) -> int:
+    """
+    Bulk upsert catalog entries into coins, keyed by symbol.
+    Returns the number of coins inserted or changed.
+    """
+    insert = dialect_insert(db)
+    changed = 0
+    for start in range(0, len(catalog), IMPORT_CHUNK_SIZE):
+        stmt = insert(Coin).values(catalog[start:start + IMPORT_CHUNK_SIZE])
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Coin.symbol],
+            set_={
+                "name": excluded.name,
+                "color": excluded.color,
+                "coingecko_id": excluded.coingecko_id,
+                "updated_at": func.now(),
+            },
+            where=or_(
+                Coin.name.is_distinct_from(excluded.name),
+                Coin.color.is_distinct_from(excluded.color),
+                Coin.coingecko_id.is_distinct_from(excluded.coingecko_id),
+            )
+        )
+        changed += db.execute(stmt).rowcount
+    db.commit()
+    logger.info(f"Imported coin catalog: {len(catalog)} entries, {changed} inserted or changed")
+    return changed
+
+def main():
+    """Import a coin catalog file: python -m app.services.coin_catalog data/coin_catalog.json"""
+    from app.database import get_db
+
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "coin_catalog.json"
+    )
+    catalog = load_catalog_file(path)
+    db = next(get_db())
+    try:
+        changed = import_catalog(db, catalog)
+        print(f"Imported {len(catalog)} coins from {path} ({changed} inserted or changed)")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,147 @@
+# services/expo_client.py
+import asyncio
+import logging
+import random
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+import httpx
+
+from app.config import settings
+from app.utils.rate_limit import AsyncTokenBucket, parse_retry_after, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+EXPO_RECEIPTS_URL = "https://exp.host/--/api/v2/push/getReceipts"
+# Expo accepts at most 100 messages per push request
+EXPO_MAX_BATCH_SIZE = 100
+# Expo accepts at most 1000 ticket IDs per receipts request
+EXPO_MAX_RECEIPT_IDS = 1000
+
+class ExpoPushClient:
+    """
+    asyncio transport for the Expo Push API: one keep-alive connection pool to
+    exp.host, at most max_in_flight concurrent requests and a token bucket
+    capped at Expo's rate limit (counted in messages, not requests). The bucket
+    holds at least one full request, so a full batch can always be sent.
+    429/5xx responses and transport errors are retried with backoff.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 6,
+        messages_per_second: float = 600,
+        max_retries: int = 3,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.messages_per_second = messages_per_second
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._rate_limiter: Optional[AsyncTokenBucket] = None
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        # Created lazily inside the loop that uses them
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_in_flight,
+                    max_keepalive_connections=self.max_in_flight,
+                    keepalive_expiry=120.0
+                ),
+                headers={
+                    'Accept': 'application/json',
+                    'Accept-encoding': 'gzip, deflate',
+                    'Content-Type': 'application/json',
+                },
+                transport=self.transport
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._rate_limiter = AsyncTokenBucket(
+                rate=self.messages_per_second,
+                capacity=max(self.messages_per_second, EXPO_MAX_BATCH_SIZE)
+            )
+        return self._client
+
+    async def _post(self, url: str, payload: Any, tokens: int) -> Optional[Dict[str, Any]]:
+        """POST with rate limiting, bounded concurrency and retries; None on failure"""
+        client = self._ensure_client()
+
+        for attempt in range(self.max_retries + 1):
+            await self._rate_limiter.acquire(tokens)
+            try:
+                async with self._semaphore:
+                    response = await client.post(url, json=payload)
+
+                retryable = response.status_code == 429 or response.status_code >= 500
+                if retryable and attempt < self.max_retries:
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    delay = retry_after + random.uniform(0, 1) if retry_after is not None else backoff_delay(attempt)
+                    logger.warning(f"Expo returned {response.status_code}, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+
+                response.raise_for_status()
+                return response.json()
+
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    logger.error(f"Request error while calling Expo: {str(e)}")
+                    return None
+                await asyncio.sleep(backoff_delay(attempt))
+            except (httpx.HTTPError, ValueError) as e:
+                logger.error(f"Error calling Expo: {str(e)}")
+                return None
+        return None
+
+    async def send(self, messages: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        POST one message or a batch (up to EXPO_MAX_BATCH_SIZE) and return Expo's response body,
+        or None if the request ultimately failed.
+        """
+        count = len(messages) if isinstance(messages, list) else 1
+        return await self._post(EXPO_PUSH_URL, messages, count)
+
+    async def get_receipts(self, ticket_ids: List[str]) -> Optional[Dict[str, Any]]:
+        """Fetch the receipts of up to EXPO_MAX_RECEIPT_IDS tickets ({"data": {id: receipt}})"""
+        return await self._post(EXPO_RECEIPTS_URL, {"ids": ticket_ids}, 1)
+
+    async def get_receipts_many(self, batches: List[List[str]]) -> List[Optional[Dict[str, Any]]]:
+        """Fetch several receipt batches concurrently, results in order"""
+        return await asyncio.gather(*(self.get_receipts(batch) for batch in batches))
+
+    async def send_many(self, batches: List[List[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+        """Send several batches concurrently (bounded by max_in_flight), results in order"""
+        return await asyncio.gather(*(self.send(batch) for batch in batches))
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+# The notification worker is synchronous; the client runs on one persistent event
+# loop in a background thread so its connection pool survives between calls
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="expo-push-loop", daemon=True).start()
+        return _loop
+
+def run_sync(coro):
+    """Run a coroutine on the push loop from synchronous code and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+expo_client = ExpoPushClient(
+    max_in_flight=settings.EXPO_MAX_IN_FLIGHT,
+    messages_per_second=settings.EXPO_MESSAGES_PER_SECOND,
+    max_retries=settings.EXPO_MAX_RETRIES
+)
@@ -0,0 +1,46 @@
+# services/http_client.py
+import httpx
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Shared client with a keep-alive connection pool. Created once in the app
+# lifespan and reused by the scheduler job and the manual update endpoints.
+_client: Optional[httpx.AsyncClient] = None
+
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=20,
+    max_keepalive_connections=10,
+    keepalive_expiry=60.0
+)
+
+def init_http_client() -> httpx.AsyncClient:
+    """Create the shared HTTP client (call from the app lifespan)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=DEFAULT_LIMITS,
+            headers={'Accept': 'application/json'}
+        )
+        logger.info("Shared HTTP client created")
+    return _client
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared HTTP client.
+    Falls back to creating one lazily when running outside the app (scripts, tests).
+    """
+    if _client is None or _client.is_closed:
+        return init_http_client()
+    return _client
+
+async def close_http_client():
+    """Close the shared HTTP client and its connection pool"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("Shared HTTP client closed")
+    _client = None
@@ -0,0 +1,175 @@
+# services/leader.py
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Awaitable, Callable, Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.config import settings
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[], Union[None, Awaitable[None]]]
+
+def lock_key(name: str) -> int:
+    """Stable signed 64-bit advisory lock key for a lock name"""
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+class AdvisoryLock:
+    """
+    Postgres session-level advisory lock held on a dedicated connection.
+    The lock lives as long as that connection: if the process dies or the
+    connection drops, Postgres releases it and another process can take over.
+    Needs a session (not transaction-pooled) connection, e.g. Supabase port 5432.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.key = lock_key(name)
+        self._conn: Optional[Connection] = None
+
+    def try_acquire(self) -> bool:
+        if self._conn is None:
+            self._conn = engine.connect()
+        acquired = self._conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+        ).scalar()
+        self._conn.commit()
+        if not acquired:
+            self._close()
+        return bool(acquired)
+
+    def heartbeat(self) -> bool:
+        """Check that the lock connection is still alive (and so the lock is still ours)"""
+        try:
+            # Session locks live as long as the session, so a live connection means we still hold it
+            self._conn.execute(text("SELECT 1"))
+            self._conn.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"Leader lock heartbeat failed: {str(e)}")
+            self._close(invalidate=True)
+            return False
+
+    def release(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            self._conn.commit()
+        except Exception as e:
+            logger.warning(f"Failed to release leader lock: {str(e)}")
+        self._close()
+
+    def _close(self, invalidate: bool = False):
+        if self._conn is None:
+            return
+        try:
+            if invalidate:
+                # Never hand a connection that may still hold the lock back to the pool
+                self._conn.invalidate()
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+class FileLock:
+    """
+    Local fallback when the database is not Postgres (development, SQLite):
+    an exclusive flock on a file, so only one worker per host is elected.
+    """
+
+    def __init__(self, name: str):
+        self.path = os.path.join(settings.LEADER_LOCK_DIR, f"{name}.lock")
+        self._fd: Optional[int] = None
+
+    def try_acquire(self) -> bool:
+        import fcntl
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def heartbeat(self) -> bool:
+        return self._fd is not None
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+class LeaderElector:
+    """
+    Runs on every worker; exactly one of them holds the lock and is the leader.
+    The leader heartbeats its lock every check interval and steps down when it
+    can't; followers retry the lock on the same interval, so leadership fails
+    over within about one interval after the leader dies.
+    """
+
+    def __init__(self, name: str, on_elected: Callback, on_demoted: Callback, check_interval: float):
+        self.name = name
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.check_interval = check_interval
+        self.is_leader = False
+        self._lock = AdvisoryLock(name) if engine.dialect.name == "postgresql" else FileLock(name)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_follower(self) -> bool:
+        """Taking part in the election without holding the lock"""
+        return self._task is not None and not self.is_leader
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            await self._set_leader(False)
+        await asyncio.to_thread(self._lock.release)
+
+    async def _run(self):
+        while True:
+            try:
+                # Lock calls block on the database, keep them off the event loop
+                if self.is_leader:
+                    if not await asyncio.to_thread(self._lock.heartbeat):
+                        logger.warning(f"Lost leadership for '{self.name}'")
+                        await self._set_leader(False)
+                elif await asyncio.to_thread(self._lock.try_acquire):
+                    logger.info(f"Elected leader for '{self.name}' (pid {os.getpid()})")
+                    await self._set_leader(True)
+            except Exception as e:
+                logger.error(f"Leader election error for '{self.name}': {str(e)}")
+                if self.is_leader:
+                    await self._set_leader(False)
+                await asyncio.to_thread(self._lock.release)
+            await asyncio.sleep(self.check_interval)
+
+    async def _set_leader(self, is_leader: bool):
+        self.is_leader = is_leader
+        callback = self.on_elected if is_leader else self.on_demoted
+        try:
+            result = callback()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.error(f"Leader callback failed for '{self.name}': {str(e)}")
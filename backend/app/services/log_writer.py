@@ -0,0 +1,100 @@
+# services/log_writer.py
+import atexit
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.models import Log
+
+logger = logging.getLogger(__name__)
+
+class BufferedLogWriter:
+    """
+    Collects notification log rows and writes them with multi-row INSERTs on
+    its own session, so dispatch never waits on one INSERT per push.
+    The buffer is flushed when it reaches max_rows, max_age_seconds after the
+    oldest row was queued (a timer, so a partial buffer doesn't wait for the
+    next add), on flush()/close() and at exit.
+    """
+
+    def __init__(self, max_rows: int = 1000, max_age_seconds: float = 5.0):
+        self.max_rows = max_rows
+        self.max_age_seconds = max_age_seconds
+        self._rows: List[dict] = []
+        self._oldest: Optional[float] = None
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def _start_timer(self):
+        # Called with the lock held, when the buffer goes from empty to non-empty
+        if self._timer is None:
+            self._timer = threading.Timer(self.max_age_seconds, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel_timer(self):
+        # Called with the lock held
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def add(self, row: dict):
+        """Queue one logs row (user_id, coin_id, price, change_percent, message)"""
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+                self._start_timer()
+            self._rows.append(row)
+            due = (
+                len(self._rows) >= self.max_rows
+                or time.monotonic() - self._oldest >= self.max_age_seconds
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all buffered rows; returns how many were written"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._oldest = None
+            self._cancel_timer()
+        if not rows:
+            return 0
+
+        db = SessionLocal()
+        try:
+            for start in range(0, len(rows), self.max_rows):
+                db.execute(insert(Log).values(rows[start:start + self.max_rows]))
+            db.commit()
+            logger.info(f"Wrote {len(rows)} notification log rows")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error writing notification logs: {str(e)}")
+            db.rollback()
+            # Keep the rows for the next flush rather than losing the history
+            with self._lock:
+                self._rows = rows + self._rows
+                self._oldest = self._oldest or time.monotonic()
+                self._start_timer()
+            return 0
+        finally:
+            db.close()
+
+    def close(self):
+        """Final flush (registered at exit)"""
+        self.flush()
+        with self._lock:
+            pending = len(self._rows)
+        if pending:
+            logger.error(f"{pending} notification log rows could not be written")
+
+notification_log_writer = BufferedLogWriter(
+    max_rows=settings.LOG_WRITER_MAX_ROWS,
+    max_age_seconds=settings.LOG_WRITER_MAX_AGE_SECONDS
+)
+atexit.register(notification_log_writer.close)
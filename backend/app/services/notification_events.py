@@ -0,0 +1,31 @@
+# services/notification_events.py
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Postgres LISTEN/NOTIFY channel the notification dispatcher listens on
+SCHEDULE_CHANNEL = "notification_schedule_changed"
+
+def notify_schedule_changed(db: Session, next_scheduled_at: Optional[datetime]):
+    """
+    Queue a wake-up for the notification dispatcher in the current transaction.
+    NOTIFY is transactional: it is delivered on commit and dropped on rollback.
+    The payload is the new next_scheduled_at (ISO 8601), or empty if unscheduled.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    payload = next_scheduled_at.isoformat() if next_scheduled_at else ""
+    # Flush pending changes first so their errors surface to the caller, not here
+    db.flush()
+    try:
+        # Savepoint, so a failed NOTIFY can't abort the caller's transaction
+        with db.begin_nested():
+            db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": SCHEDULE_CHANNEL, "payload": payload})
+    except Exception as e:
+        # The dispatcher still picks the change up on its next refill
+        logger.warning(f"Failed to notify dispatcher: {str(e)}")
@@ -0,0 +1,238 @@
+# services/price_providers.py
+import asyncio
+import json
+import logging
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.config import settings
+from app.services.http_client import get_http_client
+from app.utils.rate_limit import AsyncTokenBucket, parse_retry_after, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+class PriceProvider(ABC):
+    """
+    Source of latest prices.
+    fetch_prices() takes CoinGecko IDs (the canonical coin IDs stored in coins.coingecko_id)
+    and returns {gecko_id: {"usd": price, "usd_24h_change": percent}} for the coins it knows.
+    """
+    name = "provider"
+
+    @abstractmethod
+    async def fetch_prices(self, gecko_ids: List[str]) -> Dict[str, dict]:
+        ...
+
+class CoinGeckoProvider(PriceProvider):
+    """
+    CoinGecko /simple/price. IDs are fetched in concurrent chunks under a token bucket,
+    with backoff on 429/5xx; chunks that still fail are skipped so the rest can be applied.
+    """
+
+    def __init__(
+        self,
+        name: str = "coingecko",
+        base_url: str = "https://api.coingecko.com/api/v3",
+        api_key: Optional[str] = None,
+        api_key_header: str = "x-cg-demo-api-key",
+        chunk_size: int = 250,
+        max_concurrency: int = 4,
+        rate_limit_per_minute: int = 30,
+        max_retries: int = 3
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.headers = {api_key_header: api_key} if api_key else {}
+        self.chunk_size = chunk_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        # Shared by every refresh in the process so bursts stay within the provider plan
+        self.rate_limiter = AsyncTokenBucket(rate=rate_limit_per_minute / 60, capacity=max_concurrency)
+
+    async def fetch_prices(self, gecko_ids: List[str]) -> Dict[str, dict]:
+        chunks = [gecko_ids[i:i + self.chunk_size] for i in range(0, len(gecko_ids), self.chunk_size)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        results = await asyncio.gather(
+            *(self._fetch_chunk(chunk, semaphore) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        prices_data = {}
+        errors = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                errors.append(result)
+                logger.error(f"{self.name}: chunk of {len(chunk)} IDs failed: {str(result)}")
+            else:
+                prices_data.update(result)
+
+        if errors and len(errors) == len(chunks):
+            raise errors[0]
+        if errors:
+            logger.warning(f"{self.name}: {len(errors)} of {len(chunks)} chunks failed, applying the rest")
+
+        return prices_data
+
+    async def _fetch_chunk(self, gecko_ids: List[str], semaphore: asyncio.Semaphore) -> dict:
+        """Fetch one chunk of IDs, backing off on HTTP 429 and transient server errors"""
+        url = f"{self.base_url}/simple/price"
+        params = {
+            'ids': ','.join(gecko_ids),
+            'vs_currencies': 'usd',
+            'include_24hr_change': 'true'
+        }
+        client = get_http_client()
+
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                async with semaphore:
+                    response = await client.get(url, params=params, headers=self.headers)
+
+                retryable = response.status_code == 429 or response.status_code >= 500
+                if retryable and attempt < self.max_retries:
+                    # Respect Retry-After when given, otherwise exponential backoff with jitter
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    delay = retry_after + random.uniform(0, 1) if retry_after is not None else backoff_delay(attempt)
+                    logger.warning(
+                        f"{self.name} returned {response.status_code}, retrying in {delay:.1f}s "
+                        f"(attempt {attempt + 1}/{self.max_retries})"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+
+                response.raise_for_status()
+                return response.json()
+
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    logger.error(f"{self.name} API error: {str(e)}")
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+            except httpx.HTTPError as e:
+                logger.error(f"{self.name} API error: {str(e)}")
+                raise
+
+class FilePriceProvider(PriceProvider):
+    """
+    Local stand-in for tests and benchmarks: reads prices in the CoinGecko /simple/price
+    JSON shape from a file path or an http(s) URL on every fetch.
+    """
+
+    def __init__(self, source: str, name: str = "file"):
+        self.name = name
+        self.source = source
+
+    async def fetch_prices(self, gecko_ids: List[str]) -> Dict[str, dict]:
+        if self.source.startswith(("http://", "https://")):
+            response = await get_http_client().get(self.source)
+            response.raise_for_status()
+            data = response.json()
+        else:
+            data = await asyncio.to_thread(self._read_file)
+
+        wanted = set(gecko_ids)
+        return {gecko_id: info for gecko_id, info in data.items() if gecko_id in wanted}
+
+    def _read_file(self) -> dict:
+        with open(self.source, encoding="utf-8") as f:
+            return json.load(f)
+
+class HedgedPriceProvider(PriceProvider):
+    """
+    Hedged requests with failover: if the primary hasn't answered within hedge_after
+    seconds (or fails sooner), the secondary is fired too and the first successful
+    answer wins. Raises only when both providers fail.
+    """
+
+    def __init__(self, primary: PriceProvider, secondary: PriceProvider, hedge_after: float):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_after = hedge_after
+        self.name = f"{primary.name}+{secondary.name}"
+
+    async def fetch_prices(self, gecko_ids: List[str]) -> Dict[str, dict]:
+        primary_task = asyncio.create_task(self.primary.fetch_prices(gecko_ids))
+        tasks = [primary_task]
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=self.hedge_after)
+            if primary_task in done and primary_task.exception() is None:
+                return primary_task.result()
+
+            if primary_task in done:
+                error = primary_task.exception()
+                logger.warning(f"{self.primary.name} failed ({error}), failing over to {self.secondary.name}")
+            else:
+                error = None
+                logger.info(f"{self.primary.name} slower than {self.hedge_after}s, hedging with {self.secondary.name}")
+
+            secondary_task = asyncio.create_task(self.secondary.fetch_prices(gecko_ids))
+            tasks.append(secondary_task)
+            pending = {task for task in tasks if not task.done()}
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = self.primary if task is primary_task else self.secondary
+                        logger.info(f"Prices served by {winner.name}")
+                        return task.result()
+                    error = task.exception()
+                    logger.warning(f"Hedged price request failed: {str(error)}")
+
+            raise error
+        finally:
+            # The loser (or everything, if we were cancelled) is abandoned
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+def _build_provider(name: str) -> PriceProvider:
+    if name == "coingecko":
+        return CoinGeckoProvider(
+            name="coingecko",
+            base_url="https://api.coingecko.com/api/v3",
+            api_key=settings.COINGECKO_API_KEY,
+            api_key_header="x-cg-demo-api-key",
+            chunk_size=settings.COINGECKO_CHUNK_SIZE,
+            max_concurrency=settings.COINGECKO_MAX_CONCURRENCY,
+            rate_limit_per_minute=settings.COINGECKO_RATE_LIMIT_PER_MINUTE,
+            max_retries=settings.COINGECKO_MAX_RETRIES
+        )
+    if name == "coingecko_pro":
+        return CoinGeckoProvider(
+            name="coingecko_pro",
+            base_url="https://pro-api.coingecko.com/api/v3",
+            api_key=settings.COINGECKO_PRO_API_KEY,
+            api_key_header="x-cg-pro-api-key",
+            chunk_size=settings.COINGECKO_CHUNK_SIZE,
+            max_concurrency=settings.COINGECKO_MAX_CONCURRENCY,
+            rate_limit_per_minute=settings.COINGECKO_PRO_RATE_LIMIT_PER_MINUTE,
+            max_retries=settings.COINGECKO_MAX_RETRIES
+        )
+    if name == "file":
+        if not settings.PRICE_FILE_SOURCE:
+            raise ValueError("PRICE_FILE_SOURCE must be set to use the file price provider")
+        return FilePriceProvider(settings.PRICE_FILE_SOURCE)
+    raise ValueError(f"Unknown price provider: {name}")
+
+_provider: Optional[PriceProvider] = None
+
+def get_price_provider() -> PriceProvider:
+    """Return the configured provider (primary, hedged with the secondary if one is set)"""
+    global _provider
+    if _provider is None:
+        provider = _build_provider(settings.PRICE_PROVIDER)
+        if settings.PRICE_PROVIDER_SECONDARY:
+            provider = HedgedPriceProvider(
+                provider,
+                _build_provider(settings.PRICE_PROVIDER_SECONDARY),
+                hedge_after=settings.PRICE_HEDGE_AFTER_SECONDS
+            )
+        _provider = provider
+        logger.info(f"Using price provider: {provider.name}")
+    return _provider
@@ -1,92 +1,44 @@
 # services/price_service.py
-import requests
 import asyncio
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models.models import Coin, CoinPrice
+from app.crud.crud import CoinPriceCRUD, PriceHistoryCRUD, PriceCandleCRUD
+from app.config import settings
 from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
 import logging
-from sqlalchemy import func
+from app.services.price_providers import get_price_provider
+from app.services.price_snapshot import (
+    PriceSnapshot, as_utc, get_snapshot, publish_snapshot, load_snapshot, changed_coins
+)
+from app.services.price_stream import price_hub
+from app.services.coin_catalog import get_coin_index
 
 logger = logging.getLogger(__name__)
 
 class CoinGeckoPriceService:
-    BASE_URL = "https://api.coingecko.com/api/v3"
-    
-    # Mapping of your symbols to CoinGecko IDs
-    SYMBOL_TO_GECKO_ID = {
-        'BTC': 'bitcoin',
-        'ETH': 'ethereum',
-        'USDT': 'tether', 
-        'BNB': 'binancecoin',
-        'SOL': 'solana',
-        'USDC': 'usd-coin',
-        'XRP': 'ripple',
-        'ADA': 'cardano',
-        'DOGE': 'dogecoin',
-        'TRX': 'tron',
-        'AVAX': 'avalanche-2',
-        'SHIB': 'shiba-inu',
-        'DOT': 'polkadot',
-        'LINK': 'chainlink',
-        'BCH': 'bitcoin-cash',
-        'NEAR': 'near',
-        'MATIC': 'matic-network',
-        'LTC': 'litecoin',
-        'ICP': 'internet-computer',
-        'UNI': 'uniswap',
-        'DAI': 'dai',
-        'ATOM': 'cosmos',
-        'XLM': 'stellar',
-        'XMR': 'monero',
-        'ETC': 'ethereum-classic',
-        'HBAR': 'hedera-hashgraph',
-        'FIL': 'filecoin',
-        'APT': 'aptos',
-        'ARB': 'arbitrum',
-        'HYPE': 'hyperliquid'
-    }
-    
     @classmethod
     async def fetch_prices_for_all_coins(cls, db: Session):
-        """Fetch prices for all coins in database from CoinGecko"""
+        """Fetch prices for all coins in database (coins are identified by their CoinGecko ID)"""
         try:
-            # Get all coins from database
-            coins = db.query(Coin).all()
-            
-            if not coins:
-                logger.info("No coins found in database")
-                return
-            
-            # Prepare CoinGecko API call
-            gecko_ids = []
-            coin_map = {}
-            
-            for coin in coins:
-                gecko_id = cls.SYMBOL_TO_GECKO_ID.get(coin.symbol.upper())
-                if gecko_id:
-                    gecko_ids.append(gecko_id)
-                    coin_map[gecko_id] = coin
-                else:
-                    logger.warning(f"No CoinGecko mapping for symbol: {coin.symbol}")
+            # Provider IDs come from the coins table via the in-memory index
+            coin_index = get_coin_index(db)
+            gecko_ids = coin_index.gecko_ids
             
             if not gecko_ids:
-                logger.warning("No valid CoinGecko IDs found")
+                logger.warning("No coins with a CoinGecko ID found")
                 return
             
-            # Fetch prices from CoinGecko
-            prices_data = await cls._fetch_from_coingecko(gecko_ids)
-            
-            # Update database
-            updated_count = 0
-            for gecko_id, price_info in prices_data.items():
-                coin = coin_map.get(gecko_id)
-                if coin:
-                    await cls._update_coin_price(db, coin, price_info)
-                    updated_count += 1
+            # Fetch prices from the configured provider(s)
+            prices_data = await get_price_provider().fetch_prices(gecko_ids)
             
-            db.commit()
-            logger.info(f"Successfully updated prices for {updated_count} coins")
+            # The database phase runs in a worker thread so it doesn't stall requests and streams
+            changed_count, changes = await asyncio.to_thread(cls._apply_prices, db, coin_index, prices_data)
+            # Streams are fed from the event loop (their queues aren't thread-safe)
+            price_hub.publish_changes(changes)
+            return changed_count
             
         except Exception as e:
             logger.error(f"Error fetching prices: {str(e)}")
@@ -94,83 +46,196 @@ class CoinGeckoPriceService:
             raise
     
     @classmethod
-    async def _fetch_from_coingecko(cls, gecko_ids: list) -> dict:
-        """Fetch price data from CoinGecko API"""
-        try:
-            ids_str = ','.join(gecko_ids)
-            url = f"{cls.BASE_URL}/simple/price"
-            params = {
-                'ids': ids_str,
-                'vs_currencies': 'usd',
-                'include_24hr_change': 'true'
-            }
-            
-            response = requests.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            return response.json()
-            
-        except requests.RequestException as e:
-            logger.error(f"CoinGecko API error: {str(e)}")
-            raise
+    def _apply_prices(cls, db: Session, coin_index, prices_data: Dict[str, dict]) -> Tuple[int, List[dict]]:
+        """
+        Write one fetched tick (blocking, run in a worker thread): history and candles,
+        the coin_prices upsert for coins that moved, then reload the snapshot.
+        Returns the number of changed coins and the coins to push to the streams.
+        """
+        # Build one row per coin and write them in a single upsert
+        rows = []
+        for gecko_id, price_info in prices_data.items():
+            coin_id = coin_index.coin_id_by_gecko_id.get(gecko_id)
+            if coin_id is not None:
+                row = cls._build_price_row(coin_id, price_info)
+                if row:
+                    rows.append(row)
+        
+        # Every tick goes into the price history and candles, so charts have no gaps
+        now = datetime.now(timezone.utc)
+        PriceHistoryCRUD.append_prices(db, rows, now)
+        PriceCandleCRUD.apply_ticks(db, rows, now)
+        
+        # Only the hot coin_prices rows skip ticks that didn't move past the coin's threshold
+        previous = get_snapshot()
+        moved_rows = cls._select_moved_rows(rows, previous, coin_index, now)
+        skipped = len(rows) - len(moved_rows)
+        
+        if not moved_rows and previous is not None:
+            # Nothing moved: no current-price writes, no reload, only advance "last checked"
+            db.commit()
+            publish_snapshot(replace(previous, checked_at=now))
+            logger.info(f"Checked prices for {len(rows)} coins, none moved past their threshold")
+            return 0, []
+        
+        changed_count = CoinPriceCRUD.bulk_upsert_coin_prices(db, moved_rows)
+        db.commit()
+        logger.info(
+            f"Successfully applied prices for {len(moved_rows)} coins "
+            f"({changed_count} changed, {skipped} below threshold)"
+        )
+        
+        # Swap in a fresh snapshot for the read endpoints; what moved goes to the streams
+        snapshot = load_snapshot(db, checked_at=now)
+        return changed_count, changed_coins(previous, snapshot)
     
-    @classmethod
-    async def _update_coin_price(cls, db: Session, coin: Coin, price_info: dict):
-        """Update or create coin price record"""
-        try:
-            current_price = price_info.get('usd')
-            price_change_24h = price_info.get('usd_24h_change')
-            
-            if current_price is None:
-                logger.warning(f"No price data for coin {coin.symbol}")
-                return
-            
-            # Check if price record exists
-            existing_price = db.query(CoinPrice).filter(
-                CoinPrice.coin_id == coin.id
-            ).first()
+    @staticmethod
+    def _select_moved_rows(rows: List[dict], previous: Optional[PriceSnapshot], coin_index, now: datetime) -> List[dict]:
+        """
+        Keep the rows whose price moved by more than the coin's threshold (percent) since
+        it was last written, plus coins that were skipped for longer than PRICE_MAX_SKIP_MINUTES.
+        The snapshot holds exactly the last written prices, so no query is needed.
+        """
+        if previous is None:
+            return rows
+        
+        default_threshold = settings.PRICE_CHANGE_THRESHOLD_PCT
+        max_skip = timedelta(minutes=settings.PRICE_MAX_SKIP_MINUTES)
+        moved = []
+        for row in rows:
+            coin_data = previous.by_id.get(row["coin_id"])
+            price_data = coin_data["price"] if coin_data else None
+            if not price_data or price_data["current_price"] is None or not price_data["updated_at"]:
+                moved.append(row)
+                continue
             
-            if existing_price:
-                # Update existing record
-                existing_price.price = Decimal(str(current_price))
-                existing_price.change = Decimal(str(price_change_24h)) if price_change_24h else None
-                existing_price.is_positive = price_change_24h > 0 if price_change_24h is not None else None
-                existing_price.updated_at = func.now()
-            else:
-                # Create new record
-                new_price = CoinPrice(
-                    coin_id=coin.id,
-                    price=Decimal(str(current_price)),
-                    change=Decimal(str(price_change_24h)) if price_change_24h else None,
-                    is_positive=price_change_24h > 0 if price_change_24h is not None else None
-                )
-                db.add(new_price)
-                
-            logger.info(f"Updated price for {coin.symbol}: ${current_price}")
+            last_price = price_data["current_price"]
+            if last_price == 0:
+                moved.append(row)
+                continue
             
-        except Exception as e:
-            logger.error(f"Error updating price for {coin.symbol}: {str(e)}")
-            raise
+            threshold = coin_index.threshold_by_coin_id.get(row["coin_id"], default_threshold)
+            move_pct = abs(float(row["price"]) - last_price) / abs(last_price) * 100
+            written_at = as_utc(datetime.fromisoformat(price_data["updated_at"]))
+            if move_pct > threshold or now - written_at >= max_skip:
+                moved.append(row)
+        
+        return moved
+    
+    @staticmethod
+    def _build_price_row(coin_id: int, price_info: dict) -> Optional[dict]:
+        """Convert a CoinGecko price entry into a coin_prices row"""
+        current_price = price_info.get('usd')
+        price_change_24h = price_info.get('usd_24h_change')
+        
+        if current_price is None:
+            logger.warning(f"No price data for coin {coin_id}")
+            return None
+        
+        return {
+            "coin_id": coin_id,
+            "price": Decimal(str(current_price)),
+            "change": Decimal(str(price_change_24h)) if price_change_24h is not None else None,
+            "is_positive": price_change_24h > 0 if price_change_24h is not None else None
+        }
+
+# Single-flight refresh: at most one price refresh is in flight per process,
+# concurrent triggers (scheduler, endpoints, stale reads) join the same task
+_refresh_task: Optional[asyncio.Task] = None
+
+def _is_price_follower() -> bool:
+    """True on workers that lost the price leader election (they must not call the provider)"""
+    # Imported here: the price scheduler imports this module
+    from app.scheduler.price_scheduler import price_leader
+    return price_leader.is_follower
+
+async def reload_price_snapshot(db: Session) -> int:
+    """
+    Follower refresh: reload the prices the leader wrote to the database and push
+    what changed to this worker's streams. Returns the number of changed coins.
+    """
+    previous = get_snapshot()
+    # The query runs in a worker thread, like the leader's database phase
+    snapshot = await asyncio.to_thread(load_snapshot, db, checked_at=datetime.now(timezone.utc))
+    changes = changed_coins(previous, snapshot)
+    price_hub.publish_changes(changes)
+    return len(changes)
+
+async def _run_price_refresh():
+    """
+    Run one full price refresh on its own database session. Only the elected
+    leader fetches from the provider, followers reload what it wrote, so
+    upstream traffic doesn't grow with the number of workers.
+    """
+    db = next(get_db())
+    try:
+        if _is_price_follower():
+            return await reload_price_snapshot(db)
+        return await CoinGeckoPriceService.fetch_prices_for_all_coins(db)
+    finally:
+        db.close()
+
+def _on_refresh_done(task: asyncio.Task):
+    # Retrieve the exception so fire-and-forget triggers don't warn; it is logged already
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Background price refresh failed: {task.exception()}")
+
+def trigger_price_refresh() -> asyncio.Task:
+    """Start a price refresh in the background, or return the one already in flight"""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.get_running_loop().create_task(_run_price_refresh())
+        _refresh_task.add_done_callback(_on_refresh_done)
+    return _refresh_task
+
+def is_refresh_in_flight() -> bool:
+    return _refresh_task is not None and not _refresh_task.done()
 
 # Scheduler function to run periodically
 async def update_all_coin_prices():
     """Function to be called by scheduler"""
+    # Shield so a cancelled caller doesn't cancel the refresh other callers are joined to
+    return await asyncio.shield(trigger_price_refresh())
+
+async def sync_price_snapshot():
+    """Keep followers' snapshot and streams in step with the leader (called periodically on every worker)"""
+    if _is_price_follower():
+        await asyncio.shield(trigger_price_refresh())
+
+def _prune_price_history_sync():
     db = next(get_db())
     try:
-        await CoinGeckoPriceService.fetch_prices_for_all_coins(db)
+        now = datetime.now(timezone.utc)
+        ticks = PriceHistoryCRUD.delete_older_than(
+            db, now - timedelta(days=settings.PRICE_TICK_RETENTION_DAYS)
+        )
+        candles = PriceCandleCRUD.delete_older_than(
+            db, "5m", now - timedelta(days=settings.PRICE_CANDLE_5M_RETENTION_DAYS)
+        )
+        db.commit()
+        logger.info(f"Price history retention: removed {ticks} ticks and {candles} 5m candles")
+    except Exception as e:
+        logger.error(f"Error pruning price history: {str(e)}")
+        db.rollback()
+        raise
     finally:
         db.close()
 
+async def prune_price_history():
+    """Apply the tiered retention policy (called daily by the scheduler)"""
+    # Large deletes run in a worker thread so they don't stall the event loop
+    await asyncio.to_thread(_prune_price_history_sync)
+
 # Manual endpoint for testing
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, HTTPException
 
 router = APIRouter()
 
 @router.post("/update-prices")
-async def manually_update_prices(db: Session = Depends(get_db)):
+async def manually_update_prices():
     """Manually trigger price updates (for testing)"""
     try:
-        await CoinGeckoPriceService.fetch_prices_for_all_coins(db)
+        await update_all_coin_prices()
         return {"message": "Prices updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,99 @@
+# services/price_snapshot.py
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+from app.models.models import Coin
+import logging
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class PriceSnapshot:
+    """
+    Immutable view of all coins with their latest prices.
+    The formatted coin dicts are shared between requests and must never be mutated;
+    a new snapshot is built and swapped in instead.
+    """
+    coins: Tuple[dict, ...]
+    by_id: Dict[int, dict]
+    last_updated: Optional[datetime]
+    # When prices were last fetched from the provider, even if nothing changed
+    checked_at: Optional[datetime]
+    built_at: datetime
+
+# Current snapshot; replaced as a whole (single reference assignment) after each commit
+_snapshot: Optional[PriceSnapshot] = None
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize a datetime to timezone-aware UTC (naive values are assumed UTC)"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def format_coin_response(coin: Coin) -> dict:
+    """Format a coin object into the response format"""
+    coin_data = {
+        "id": coin.id,
+        "name": coin.name,
+        "symbol": coin.symbol,
+        "color": coin.color,
+        "price": None
+    }
+
+    # Add price data if available
+    if coin.price:
+        coin_data["price"] = {
+            "current_price": float(coin.price.price) if coin.price.price is not None else None,
+            "change_24h": float(coin.price.change) if coin.price.change is not None else None,
+            "is_positive": coin.price.is_positive,
+            "updated_at": coin.price.updated_at.isoformat() if coin.price.updated_at else None
+        }
+
+    return coin_data
+
+def build_snapshot(coins, checked_at: Optional[datetime] = None) -> PriceSnapshot:
+    """Build a snapshot from Coin rows with their price relationship loaded"""
+    formatted = []
+    last_updated = None
+    for coin in sorted(coins, key=lambda c: c.id):
+        formatted.append(format_coin_response(coin))
+        updated_at = as_utc(coin.price.updated_at) if coin.price else None
+        if updated_at and (last_updated is None or updated_at > last_updated):
+            last_updated = updated_at
+
+    return PriceSnapshot(
+        coins=tuple(formatted),
+        by_id={coin_data["id"]: coin_data for coin_data in formatted},
+        last_updated=last_updated,
+        checked_at=as_utc(checked_at) or last_updated,
+        built_at=datetime.now(timezone.utc)
+    )
+
+def get_snapshot() -> Optional[PriceSnapshot]:
+    """Return the current snapshot, or None before the first load"""
+    return _snapshot
+
+def publish_snapshot(snapshot: PriceSnapshot) -> PriceSnapshot:
+    """Atomically swap in a new snapshot"""
+    global _snapshot
+    _snapshot = snapshot
+    return snapshot
+
+def load_snapshot(db: Session, checked_at: Optional[datetime] = None) -> PriceSnapshot:
+    """Load coins with prices from the database and publish them as the new snapshot"""
+    coins = db.query(Coin).options(joinedload(Coin.price)).all()
+    snapshot = publish_snapshot(build_snapshot(coins, checked_at))
+    logger.info(f"Price snapshot loaded with {len(snapshot.coins)} coins")
+    return snapshot
+
+def changed_coins(previous: Optional[PriceSnapshot], current: PriceSnapshot) -> list:
+    """Return the formatted coins in current whose data differs from previous"""
+    if previous is None:
+        return list(current.coins)
+    return [
+        coin_data for coin_data in current.coins
+        if previous.by_id.get(coin_data["id"]) != coin_data
+    ]
@@ -0,0 +1,83 @@
+# services/price_stream.py
+import asyncio
+import json
+import logging
+from typing import List, Optional, Set
+
+from app.services.price_snapshot import PriceSnapshot, get_snapshot
+
+logger = logging.getLogger(__name__)
+
+class PriceSubscription:
+    """
+    One stream subscriber with a small bounded queue of encoded messages.
+    If the subscriber falls behind and its queue fills up, pending updates are
+    dropped and it is resynced with a full snapshot instead, so a slow client
+    never blocks the publisher or the other subscribers.
+    """
+    __slots__ = ("queue", "needs_resync")
+
+    def __init__(self, max_queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.needs_resync = False
+
+    def offer(self, message: str):
+        if self.needs_resync:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Drop the backlog; the reader sends a fresh snapshot on its next get()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.needs_resync = True
+            self.queue.put_nowait(None)
+
+    async def get(self) -> str:
+        message = await self.queue.get()
+        if message is None or self.needs_resync:
+            self.needs_resync = False
+            return price_hub.snapshot_message()
+        return message
+
+class PriceBroadcastHub:
+    """In-process fan-out of price updates to all stream subscribers"""
+
+    def __init__(self, max_queue_size: int = 8):
+        self.max_queue_size = max_queue_size
+        self._subscribers: Set[PriceSubscription] = set()
+        self._snapshot_cache: Optional[tuple] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> PriceSubscription:
+        subscription = PriceSubscription(self.max_queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: PriceSubscription):
+        self._subscribers.discard(subscription)
+
+    def snapshot_message(self, snapshot: Optional[PriceSnapshot] = None) -> str:
+        """Encode the full snapshot once per snapshot version and reuse it for every client"""
+        snapshot = snapshot or get_snapshot()
+        cached = self._snapshot_cache
+        if cached is not None and cached[0] is snapshot:
+            return cached[1]
+        coins = list(snapshot.coins) if snapshot else []
+        message = json.dumps({"type": "snapshot", "coins": coins})
+        self._snapshot_cache = (snapshot, message)
+        return message
+
+    def publish_changes(self, coins: List[dict]):
+        """Send the changed coins to every subscriber (encoded once, never awaits)"""
+        if not coins or not self._subscribers:
+            return
+        message = json.dumps({"type": "update", "coins": coins})
+        for subscription in list(self._subscribers):
+            subscription.offer(message)
+        logger.info(f"Published {len(coins)} price changes to {len(self._subscribers)} subscribers")
+
+price_hub = PriceBroadcastHub()
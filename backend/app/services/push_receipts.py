@@ -0,0 +1,119 @@
+# services/push_receipts.py
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Collection, Dict, List
+
+from sqlalchemy import delete, insert, tuple_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import get_db
+from app.models.models import PushTicket, UserPushToken
+from app.services.expo_client import EXPO_MAX_RECEIPT_IDS, expo_client, run_sync
+from app.services.price_snapshot import as_utc
+
+logger = logging.getLogger(__name__)
+
+# Expo keeps receipts for 24 hours; tickets without a receipt after that are dropped
+RECEIPT_RETENTION = timedelta(hours=24)
+
+def record_push_tickets(db: Session, tickets: List[Dict]):
+    """
+    Store ok tickets (id, notification_id, user_id, push_token) for receipt checking,
+    in one executemany INSERT; commit is left to the caller
+    """
+    if tickets:
+        db.execute(insert(PushTicket), tickets)
+
+def prune_push_tokens(db: Session, push_tokens: Collection[str]) -> int:
+    """Delete dead push tokens in one statement; returns how many rows were deleted"""
+    if not push_tokens:
+        return 0
+    result = db.execute(
+        delete(UserPushToken).where(UserPushToken.push_token.in_(list(push_tokens)))
+    )
+    logger.info(f"Pruned {result.rowcount} unregistered push tokens")
+    return result.rowcount
+
+def check_push_receipts() -> int:
+    """
+    Fetch receipts for tickets older than PUSH_RECEIPT_DELAY_MINUTES in bulk
+    (1000 IDs per request, requests in flight together), prune tokens reported
+    as DeviceNotRegistered and delete the checked tickets. Pages through the
+    tickets by (created_at, id), one transaction per page.
+    Returns the number of receipts checked.
+    """
+    db = next(get_db())
+    try:
+        now = datetime.now(timezone.utc)
+        ready_before = now - timedelta(minutes=settings.PUSH_RECEIPT_DELAY_MINUTES)
+        expired_before = now - RECEIPT_RETENTION
+        page_size = settings.PUSH_RECEIPT_PAGE_SIZE
+
+        checked = 0
+        last_key = None
+        while True:
+            query = db.query(
+                PushTicket.id, PushTicket.push_token, PushTicket.created_at
+            ).filter(PushTicket.created_at <= ready_before)
+            if last_key is not None:
+                query = query.filter(tuple_(PushTicket.created_at, PushTicket.id) > last_key)
+            tickets = query.order_by(PushTicket.created_at, PushTicket.id).limit(page_size).all()
+            if not tickets:
+                break
+            last_key = (tickets[-1].created_at, tickets[-1].id)
+
+            ids = [ticket.id for ticket in tickets]
+            batches = [ids[start:start + EXPO_MAX_RECEIPT_IDS] for start in range(0, len(ids), EXPO_MAX_RECEIPT_IDS)]
+            responses = run_sync(expo_client.get_receipts_many(batches))
+
+            receipts = {}
+            fetched = set()
+            for batch, response in zip(batches, responses):
+                data = response.get('data') if response else None
+                if not isinstance(data, dict):
+                    logger.error(f"Fetching {len(batch)} push receipts failed: {response.get('errors') if response else 'no response'}")
+                    continue
+                receipts.update(data)
+                fetched.update(batch)
+
+            done = []
+            dead_tokens = set()
+            for ticket in tickets:
+                if ticket.id not in fetched:
+                    # Request failed, try again next time
+                    continue
+                receipt = receipts.get(ticket.id)
+                if receipt is None:
+                    # Not ready yet, unless Expo has already dropped it
+                    if as_utc(ticket.created_at) <= expired_before:
+                        done.append(ticket.id)
+                    continue
+
+                done.append(ticket.id)
+                if receipt.get('status') == 'error':
+                    error = (receipt.get('details') or {}).get('error', receipt.get('message', 'Unknown error'))
+                    if error == 'DeviceNotRegistered':
+                        dead_tokens.add(ticket.push_token)
+                    else:
+                        logger.error(f"Push receipt error for ticket {ticket.id}: {error}")
+
+            prune_push_tokens(db, dead_tokens)
+            if done:
+                db.execute(delete(PushTicket).where(PushTicket.id.in_(done)))
+            db.commit()
+            checked += len(done)
+
+            if len(tickets) < page_size:
+                break
+
+        if checked:
+            logger.info(f"Checked {checked} push receipts")
+        return checked
+
+    except Exception as e:
+        logger.error(f"Error checking push receipts: {str(e)}")
+        db.rollback()
+        return 0
+    finally:
+        db.close()
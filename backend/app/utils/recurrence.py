@@ -0,0 +1,143 @@
+"""
+Recurrence engine for notification schedules, shared by the notifications
+router and the notification scheduler so both compute identical times.
+
+Works on the stored columns directly (frequency_type, interval_hours,
+preferred_time, preferred_day as 0=Monday..6=Sunday) and always in UTC.
+The batch API computes next-fire times for whole arrays of notifications
+in a single NumPy pass over epoch microseconds.
+"""
+from datetime import datetime, time, timezone
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+FREQUENCY_CODES = {"hourly": 0, "custom": 1, "daily": 2, "weekly": 3}
+DAY_NAMES = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+_SECOND_US = 1_000_000
+_HOUR_US = 3600 * _SECOND_US
+_DAY_US = 24 * _HOUR_US
+_WEEK_US = 7 * _DAY_US
+# 1970-01-01 was a Thursday (weekday 3 with Monday = 0)
+_EPOCH_WEEKDAY = 3
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def convert_day_name_to_number(day_name: Union[str, int, None]) -> Optional[int]:
+    """Convert a day name to its number (0=Monday, 6=Sunday); ints pass through"""
+    if day_name is None or isinstance(day_name, int):
+        return day_name
+    try:
+        return DAY_NAMES.index(day_name.lower())
+    except ValueError:
+        return 0
+
+def seconds_of_day(preferred_time: Union[datetime, time, str, None]) -> int:
+    """Seconds since midnight of a stored preferred_time (or "HH:MM"), -1 if unset"""
+    if preferred_time is None:
+        return -1
+    if isinstance(preferred_time, str):
+        preferred_time = datetime.strptime(preferred_time, "%H:%M").time()
+    return preferred_time.hour * 3600 + preferred_time.minute * 60 + preferred_time.second
+
+def _to_epoch_us(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * _SECOND_US + delta.microseconds
+
+def _now_us(now: Union[datetime, Sequence[datetime], None]):
+    if now is None:
+        return _to_epoch_us(datetime.now(timezone.utc))
+    if isinstance(now, datetime):
+        return _to_epoch_us(now)
+    return np.fromiter((_to_epoch_us(value) for value in now), dtype=np.int64, count=len(now))
+
+def next_fire_times_array(
+    frequency_codes: np.ndarray,
+    interval_hours: np.ndarray,
+    preferred_seconds: np.ndarray,
+    preferred_days: np.ndarray,
+    now: Union[datetime, Sequence[datetime], None] = None
+) -> np.ndarray:
+    """
+    Next fire time (epoch microseconds, int64) after now for each notification;
+    now is one time for all of them or a sequence with one base time per notification:
+    - hourly: the next full hour
+    - custom: now + interval_hours
+    - daily: the next occurrence of preferred_time
+    - weekly: the next occurrence of preferred_day at preferred_time (later today counts)
+    Missing or invalid settings (code/interval/time/day < 0) fall back to now + 1 hour.
+    """
+    now_us = _now_us(now)
+    codes = np.asarray(frequency_codes, dtype=np.int64)
+    hours = np.asarray(interval_hours, dtype=np.int64)
+    seconds = np.asarray(preferred_seconds, dtype=np.int64)
+    days = np.asarray(preferred_days, dtype=np.int64)
+
+    midnight = now_us - now_us % _DAY_US
+    weekday = (now_us // _DAY_US + _EPOCH_WEEKDAY) % 7
+    at_time = midnight + seconds * _SECOND_US
+
+    daily = np.where(at_time > now_us, at_time, at_time + _DAY_US)
+    weekly = at_time + ((days - weekday) % 7) * _DAY_US
+    weekly = np.where(weekly > now_us, weekly, weekly + _WEEK_US)
+
+    result = np.broadcast_to(now_us + _HOUR_US, codes.shape).astype(np.int64)
+    result = np.where(codes == 0, now_us - now_us % _HOUR_US + _HOUR_US, result)
+    result = np.where((codes == 1) & (hours > 0), now_us + hours * _HOUR_US, result)
+    result = np.where((codes == 2) & (seconds >= 0), daily, result)
+    result = np.where((codes == 3) & (seconds >= 0) & (days >= 0), weekly, result)
+    return result
+
+def to_datetimes(epoch_us: np.ndarray) -> List[datetime]:
+    """Convert an array of epoch microseconds to timezone-aware UTC datetimes"""
+    # A wave shares few distinct slots, so only build one datetime per distinct value
+    unique, inverse = np.unique(np.asarray(epoch_us, dtype=np.int64), return_inverse=True)
+    converted = [
+        value.replace(tzinfo=timezone.utc)
+        for value in unique.astype("datetime64[us]").tolist()
+    ]
+    return [converted[index] for index in inverse.ravel().tolist()]
+
+def next_fire_times(
+    notifications: Sequence,
+    now: Union[datetime, Sequence[datetime], None] = None
+) -> List[datetime]:
+    """
+    Batch API: next fire times for notification objects or rows exposing
+    frequency_type, interval_hours, preferred_time and preferred_day.
+    now can be a sequence with one base time per notification.
+    """
+    count = len(notifications)
+    codes = np.fromiter(
+        (FREQUENCY_CODES.get(n.frequency_type, -1) for n in notifications), dtype=np.int64, count=count
+    )
+    hours = np.fromiter(
+        (n.interval_hours or 0 for n in notifications), dtype=np.int64, count=count
+    )
+    seconds = np.fromiter(
+        (seconds_of_day(n.preferred_time) for n in notifications), dtype=np.int64, count=count
+    )
+    days = np.fromiter(
+        (-1 if n.preferred_day is None else n.preferred_day for n in notifications), dtype=np.int64, count=count
+    )
+    return to_datetimes(next_fire_times_array(codes, hours, seconds, days, now))
+
+def next_fire_time(
+    frequency_type: str,
+    interval_hours: Optional[int] = None,
+    preferred_time: Union[datetime, time, str, None] = None,
+    preferred_day: Union[str, int, None] = None,
+    now: Optional[datetime] = None
+) -> datetime:
+    """Next fire time for a single notification (same engine as the batch API)"""
+    day = convert_day_name_to_number(preferred_day)
+    result = next_fire_times_array(
+        np.array([FREQUENCY_CODES.get(frequency_type, -1)]),
+        np.array([interval_hours or 0]),
+        np.array([seconds_of_day(preferred_time)]),
+        np.array([-1 if day is None else day]),
+        now
+    )
+    return to_datetimes(result)[0]
@@ -7,6 +7,7 @@ import uvicorn
 from app.routers import auth, users, coins, favorites, notifications, logs
 from app.database import init_db
 from app.services import price_service
+from app.services.http_client import init_http_client, close_http_client
 
 from app.scheduler.price_scheduler import start_background_tasks, stop_background_tasks
 
@@ -14,8 +15,17 @@ from app.scheduler.price_scheduler import start_background_tasks, stop_backgroun
 async def lifespan(app: FastAPI):
     print("Starting up...")
     await init_db()
+    # Shared keep-alive HTTP pool for CoinGecko, reused by the scheduler and endpoints
+    init_http_client()
+    # on_event handlers are ignored when a lifespan is set, so start the scheduler here
+    # Joins the leader election; the price scheduler only runs on the elected worker
+    start_background_tasks()
+    print("Price scheduler leader election started")
     yield
     print("Shutting down...")
+    await stop_background_tasks()
+    print("Price scheduler stopped")
+    await close_http_client()
 
 app = FastAPI(
     title="Crypto Pulse API",
@@ -42,22 +52,6 @@ app.include_router(favorites.router, prefix="/api/favorites", tags=["Favorites"]
 app.include_router(notifications.router, prefix="/api/notifications", tags=["Notifications"])
 app.include_router(logs.router, prefix="/api/logs", tags=["logs"])
 
-
-@app.on_event("startup")
-async def startup_event():
-    """Start background tasks when the app starts"""
-    print("Starting Crypto Pulse API...")
-    start_background_tasks()
-    print("Price scheduler started")
-
-# Shutdown event - stop the price scheduler
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Clean up background tasks when the app shuts down"""
-    print("Shutting down Crypto Pulse API...")
-    stop_background_tasks()
-    print("Price scheduler stopped")
-    
 @app.get("/")
 async def root():
     return {"message": "Crypto Pulse API", "status": "running"}
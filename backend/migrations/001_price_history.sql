@@ -0,0 +1,9 @@
+-- Append-only price ticks written by the price ingestion job.
+-- The (coin_id, ts) primary key is the index used by chart range queries.
+CREATE TABLE IF NOT EXISTS public.price_history (
+    coin_id BIGINT NOT NULL REFERENCES public.coins (id) ON UPDATE CASCADE ON DELETE CASCADE,
+    ts TIMESTAMPTZ NOT NULL,
+    price NUMERIC NOT NULL,
+    change NUMERIC,
+    PRIMARY KEY (coin_id, ts)
+);
@@ -0,0 +1,17 @@
+-- OHLC candles maintained incrementally from price ticks.
+-- Retention: 5m candles are pruned after PRICE_CANDLE_5M_RETENTION_DAYS, 1h and 1d are kept.
+CREATE TABLE IF NOT EXISTS public.price_candles (
+    coin_id BIGINT NOT NULL REFERENCES public.coins (id) ON UPDATE CASCADE ON DELETE CASCADE,
+    resolution VARCHAR(3) NOT NULL,
+    bucket_start TIMESTAMPTZ NOT NULL,
+    open NUMERIC NOT NULL,
+    high NUMERIC NOT NULL,
+    low NUMERIC NOT NULL,
+    close NUMERIC NOT NULL,
+    samples INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (coin_id, resolution, bucket_start)
+);
+
+-- Retention deletes scan by age, not by coin
+CREATE INDEX IF NOT EXISTS ix_price_history_ts ON public.price_history (ts);
+CREATE INDEX IF NOT EXISTS ix_price_candles_resolution_bucket ON public.price_candles (resolution, bucket_start);
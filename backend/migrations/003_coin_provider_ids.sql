@@ -0,0 +1,55 @@
+-- Price provider ID per coin, replacing the hardcoded symbol mapping.
+-- updated_at lets the in-memory coin index detect catalog changes cheaply.
+ALTER TABLE public.coins ADD COLUMN IF NOT EXISTS coingecko_id TEXT UNIQUE;
+ALTER TABLE public.coins ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS ix_coins_updated_at ON public.coins (updated_at);
+
+CREATE OR REPLACE FUNCTION public.touch_coins_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS coins_touch_updated_at ON public.coins;
+CREATE TRIGGER coins_touch_updated_at
+    BEFORE UPDATE ON public.coins
+    FOR EACH ROW EXECUTE FUNCTION public.touch_coins_updated_at();
+
+-- Backfill the mapping that used to live in CoinGeckoPriceService.SYMBOL_TO_GECKO_ID
+UPDATE public.coins AS c
+SET coingecko_id = v.coingecko_id
+FROM (VALUES
+    ('BTC', 'bitcoin'),
+    ('ETH', 'ethereum'),
+    ('USDT', 'tether'),
+    ('BNB', 'binancecoin'),
+    ('SOL', 'solana'),
+    ('USDC', 'usd-coin'),
+    ('XRP', 'ripple'),
+    ('ADA', 'cardano'),
+    ('DOGE', 'dogecoin'),
+    ('TRX', 'tron'),
+    ('AVAX', 'avalanche-2'),
+    ('SHIB', 'shiba-inu'),
+    ('DOT', 'polkadot'),
+    ('LINK', 'chainlink'),
+    ('BCH', 'bitcoin-cash'),
+    ('NEAR', 'near'),
+    ('MATIC', 'matic-network'),
+    ('LTC', 'litecoin'),
+    ('ICP', 'internet-computer'),
+    ('UNI', 'uniswap'),
+    ('DAI', 'dai'),
+    ('ATOM', 'cosmos'),
+    ('XLM', 'stellar'),
+    ('XMR', 'monero'),
+    ('ETC', 'ethereum-classic'),
+    ('HBAR', 'hedera-hashgraph'),
+    ('FIL', 'filecoin'),
+    ('APT', 'aptos'),
+    ('ARB', 'arbitrum'),
+    ('HYPE', 'hyperliquid')
+) AS v (symbol, coingecko_id)
+WHERE c.symbol = v.symbol AND c.coingecko_id IS NULL;
@@ -0,0 +1,9 @@
+-- Per-coin write-skip threshold in percent. Ticks that move a coin's price by less
+-- than this don't update its coin_prices row; they are still recorded in price_history
+-- and price_candles (NULL falls back to PRICE_CHANGE_THRESHOLD_PCT).
+ALTER TABLE public.coins ADD COLUMN IF NOT EXISTS price_change_threshold NUMERIC;
+
+-- Stablecoins barely move; only update their current price on moves of at least 0.05%
+UPDATE public.coins
+SET price_change_threshold = 0.05
+WHERE symbol IN ('USDT', 'USDC', 'DAI') AND price_change_threshold IS NULL;
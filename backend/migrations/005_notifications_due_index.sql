@@ -0,0 +1,6 @@
+-- Partial index for the overdue scan: only active notifications, ordered by
+-- (next_scheduled_at, id) so the scheduler can page through them by keyset.
+-- CONCURRENTLY avoids locking writes on a large table; run it outside a transaction.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_due
+    ON public.notifications (next_scheduled_at, id)
+    WHERE is_active;
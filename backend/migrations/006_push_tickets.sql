@@ -0,0 +1,13 @@
+-- Expo push tickets awaiting their receipt. The receipt poller fetches receipts for
+-- tickets older than a few minutes in bulk, prunes tokens Expo reports as
+-- DeviceNotRegistered and deletes the checked tickets.
+-- No foreign keys: tickets outlive deleted notifications and tokens until checked.
+CREATE TABLE IF NOT EXISTS public.push_tickets (
+    id TEXT PRIMARY KEY,
+    notification_id UUID,
+    user_id UUID NOT NULL,
+    push_token TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_push_tickets_created_at ON public.push_tickets (created_at);
@@ -0,0 +1,5 @@
+-- Digest mode claims a user's other upcoming notifications together with a due one.
+-- CONCURRENTLY avoids locking writes on a large table; run it outside a transaction.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_user_due
+    ON public.notifications (user_id, next_scheduled_at)
+    WHERE is_active;
@@ -0,0 +1,31 @@
+-- Delivery outbox: the notification scheduler enqueues rendered pushes here in the
+-- same transaction that advances next_scheduled_at, and sender workers drain it with
+-- retries. (notification_id, scheduled_for) is the idempotency key: a slot is
+-- enqueued at most once, even if a scheduler run crashes and is repeated.
+CREATE TABLE IF NOT EXISTS public.notification_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    notification_id UUID NOT NULL,
+    scheduled_for TIMESTAMPTZ NOT NULL,
+    user_id UUID NOT NULL,
+    coin_id BIGINT,
+    push_token TEXT NOT NULL,
+    message JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_error TEXT,
+    ticket_id TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    sent_at TIMESTAMPTZ,
+    CONSTRAINT uq_notification_outbox_slot UNIQUE (notification_id, scheduled_for)
+);
+
+-- Sender claim scan (pending rows in retry order)
+CREATE INDEX IF NOT EXISTS ix_notification_outbox_pending
+    ON public.notification_outbox (next_attempt_at, id)
+    WHERE status = 'pending';
+
+-- Retention purge of sent/failed rows
+CREATE INDEX IF NOT EXISTS ix_notification_outbox_done
+    ON public.notification_outbox (created_at)
+    WHERE status <> 'pending';
@@ -6,15 +6,18 @@ Run this script to verify your database setup is working correctly.
 
 import asyncio
 import sys
+import time
 import traceback
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import uuid
 
 from app.database import init_db, close_db, get_db, check_db_health, engine
 from app.models.models import User, Coin, CoinPrice, Favorite, Log, Notification
 from app.crud.crud import UserCRUD, CoinCRUD, CoinPriceCRUD, FavoriteCRUD, LogCRUD, NotificationCRUD
 from app.schemas.schemas import CoinCreate, CoinPriceCreate, FavoriteCreate, LogCreate, NotificationCreate
+from app.scheduler.notification_scheduler import advance_notification_schedules
+from app.services.log_writer import BufferedLogWriter
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
@@ -184,6 +187,78 @@ class DatabaseTester:
         finally:
             db.close()
 
+    def test_notification_schedule_advance(self):
+        """A notification claimed before its slot (digest sibling) must be rescheduled past that slot"""
+        try:
+            db = next(get_db())
+            
+            user = db.query(User).first()
+            if not user or 'coin_id' not in self.test_data:
+                self.log_test("Advance Early-Claimed Notification", False, "Needs a user and the test coin")
+                return False
+            
+            # Hourly notification whose slot is the next full hour, claimed now (before it)
+            slot = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            notification = Notification(
+                user_id=user.id,
+                coin_id=self.test_data['coin_id'],
+                frequency_type="hourly",
+                is_active=True,
+                next_scheduled_at=slot
+            )
+            db.add(notification)
+            db.commit()
+            
+            try:
+                advance_notification_schedules([notification], db)
+                db.commit()
+                db.refresh(notification)
+                advanced = notification.next_scheduled_at > slot
+                self.log_test("Advance Early-Claimed Notification", advanced, f"Slot {slot}, next {notification.next_scheduled_at}")
+                return advanced
+            finally:
+                db.delete(notification)
+                db.commit()
+            
+        except Exception as e:
+            self.log_test("Advance Early-Claimed Notification", False, str(e))
+            return False
+        finally:
+            db.close()
+
+    def test_log_writer_timed_flush(self):
+        """A partial log buffer is written once it is max_age_seconds old, without another add"""
+        try:
+            db = next(get_db())
+            
+            user = db.query(User).first()
+            if not user or 'coin_id' not in self.test_data:
+                self.log_test("Log Writer Timed Flush", False, "Needs a user and the test coin")
+                return False
+            
+            marker = f"log writer test {uuid.uuid4()}"
+            writer = BufferedLogWriter(max_rows=1000, max_age_seconds=0.5)
+            writer.add({
+                'user_id': user.id,
+                'coin_id': self.test_data['coin_id'],
+                'price': Decimal("1.0"),
+                'change_percent': None,
+                'message': marker
+            })
+            time.sleep(1.5)
+            
+            written = db.query(Log).filter(Log.message == marker).count()
+            self.log_test("Log Writer Timed Flush", written == 1, f"{written} row(s) written by the timer")
+            db.query(Log).filter(Log.message == marker).delete()
+            db.commit()
+            return written == 1
+            
+        except Exception as e:
+            self.log_test("Log Writer Timed Flush", False, str(e))
+            return False
+        finally:
+            db.close()
+
     def cleanup_test_data(self):
         """Clean up test data created during testing"""
         try:
@@ -222,6 +297,8 @@ class DatabaseTester:
         self.test_crud_operations()
         self.test_relationships()
         self.test_queries()
+        self.test_notification_schedule_advance()
+        self.test_log_writer_timed_flush()
         
         # Cleanup
         self.cleanup_test_data()
@@ -2,6 +2,8 @@
 import { useState, useEffect, useCallback, useRef } from 'react';
 import { coinsService } from '../services/api';
 
+const STREAM_RECONNECT_DELAY = 5000;
+
 export const useCoins = (autoRefresh = false, refreshInterval = 5 * 60 * 1000) => { // 5 minutes default
   const [coins, setCoins] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -9,6 +11,9 @@ export const useCoins = (autoRefresh = false, refreshInterval = 5 * 60 * 1000) =
   const [lastUpdated, setLastUpdated] = useState(null);
   const intervalRef = useRef(null);
   const mountedRef = useRef(true);
+  const streamRef = useRef(null);
+  const streamConnectedRef = useRef(false);
+  const reconnectRef = useRef(null);
 
   // Cleanup on unmount
   useEffect(() => {
@@ -17,6 +22,12 @@ export const useCoins = (autoRefresh = false, refreshInterval = 5 * 60 * 1000) =
       if (intervalRef.current) {
         clearInterval(intervalRef.current);
       }
+      if (reconnectRef.current) {
+        clearTimeout(reconnectRef.current);
+      }
+      if (streamRef.current) {
+        streamRef.current.close();
+      }
     };
   }, []);
 
@@ -58,10 +69,73 @@ export const useCoins = (autoRefresh = false, refreshInterval = 5 * 60 * 1000) =
     fetchCoins(false);
   }, [fetchCoins]);
 
-  // Setup auto-refresh
+  // Live price stream: full snapshot on connect, then only the coins that changed
+  useEffect(() => {
+    if (!autoRefresh) return;
+
+    const connect = () => {
+      const socket = new WebSocket(coinsService.getPriceStreamUrl());
+      streamRef.current = socket;
+
+      socket.onopen = () => {
+        streamConnectedRef.current = true;
+        console.log('Price stream connected');
+      };
+
+      socket.onmessage = (event) => {
+        if (!mountedRef.current) return;
+        const message = JSON.parse(event.data);
+        const received = message.coins.map(coin => coinsService.transformCoinData(coin));
+
+        if (message.type === 'snapshot') {
+          setCoins(received);
+        } else {
+          const updates = new Map(received.map(coin => [coin.id, coin]));
+          setCoins(prevCoins =>
+            prevCoins.map(coin =>
+              updates.has(coin.id)
+                ? { ...updates.get(coin.id), isFavorite: coin.isFavorite }
+                : coin
+            )
+          );
+        }
+        setLastUpdated(new Date());
+      };
+
+      socket.onclose = () => {
+        streamConnectedRef.current = false;
+        streamRef.current = null;
+        // Polling covers the gap until the stream is back
+        if (mountedRef.current) {
+          reconnectRef.current = setTimeout(connect, STREAM_RECONNECT_DELAY);
+        }
+      };
+
+      socket.onerror = (err) => {
+        console.error('Price stream error:', err.message);
+      };
+    };
+
+    connect();
+
+    return () => {
+      if (reconnectRef.current) {
+        clearTimeout(reconnectRef.current);
+      }
+      if (streamRef.current) {
+        streamRef.current.onclose = null;
+        streamRef.current.close();
+        streamRef.current = null;
+      }
+      streamConnectedRef.current = false;
+    };
+  }, [autoRefresh]);
+
+  // Setup auto-refresh (fallback polling while the stream is disconnected)
   useEffect(() => {
     if (autoRefresh && refreshInterval > 0) {
       intervalRef.current = setInterval(() => {
+        if (streamConnectedRef.current) return;
         console.log('Auto-refreshing coins data...');
         backgroundRefresh();
       }, refreshInterval);
@@ -204,6 +204,14 @@ export const coinsService = {
     }
   },
 
+  /**
+   * WebSocket URL of the live price stream
+   * @returns {string} ws:// or wss:// URL for /api/coins/stream
+   */
+  getPriceStreamUrl() {
+    return `${API_BASE_URL.replace(/^http/, 'ws')}/api/coins/stream`;
+  },
+
   /**
    * Transform backend coin data to frontend format
    * @param {Object} coinData - Raw coin data from backend